@@ -1,7 +1,18 @@
 import os
-import requests
-import json
-from models import UserContext, Recommendation
+import asyncio
+import time
+from typing import Awaitable, Callable, List, Optional, Union
+from models import UserContext, Recommendation, WellnessPlan
+from llm_client import GroqClient, GroqError
+from resilience import CircuitOpenError, UpstreamError
+from cache import ResponseCache, context_fingerprint
+from singleflight import SingleFlight, request_fingerprint
+from images import PreparedImage, prepare_image
+from routing import ModelRouter
+from output_contract import PARTIAL, OutputContract
+from intents import IntentEngine
+from doubt_cache import DoubtCache
+from tracing import span
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -9,6 +20,9 @@ from dotenv import load_dotenv
 env_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env")
 load_dotenv(dotenv_path=env_path, override=True)
 
+# Each remembered turn is clipped so the prompt stays flat as conversations grow
+MEMORY_TURN_CHARS = 300
+
 class AroMiAgent:
     def __init__(self):
         # Force reload if not found
@@ -26,50 +40,132 @@ class AroMiAgent:
         else:
             print("⚠ AroMi Neural Core: GROQ_API_KEY missing in .env file.")
 
-    def _call_groq_rest(self, prompt: str, model: str = None) -> str:
+        self.client = GroqClient(self.api_key)
+        self.inflight = SingleFlight()
+        self.router = ModelRouter.from_env()
+        # Local classifier: offline replies, and greetings/thanks without an LLM call
+        self.intents = IntentEngine.from_env()
+        # Answers to near-duplicate questions (same goals/location) are reused (None when disabled)
+        self.doubt_cache = DoubtCache.from_env(self.intents.model)
+        self.contracts = {
+            "recommendation": OutputContract("recommendation", Recommendation, min_fields=2),
+            "wellness_plan": OutputContract("wellness_plan", WellnessPlan, min_fields=2),
+        }
+        self.response_cache = ResponseCache(
+            "llm_responses",
+            maxsize=int(os.getenv("LLM_CACHE_MAX_ENTRIES", 2048)),
+            ttl=float(os.getenv("LLM_CACHE_TTL", 900)),
+        )
+        # Vision analyses keyed on image digest + endpoint + prompt (which carries the context)
+        self.vision_cache = ResponseCache(
+            "vision_analyses",
+            maxsize=int(os.getenv("VISION_CACHE_MEMORY_ENTRIES", 256)),
+            ttl=float(os.getenv("VISION_CACHE_TTL", 30 * 24 * 3600)),
+        )
+
+    async def aclose(self):
+        """Releases the pooled upstream connections."""
+        await self.client.aclose()
+
+    async def _call_groq_rest(self, prompt: str, model: str = None, task: str = "chat", json_mode: bool = False) -> str:
         try:
             # Groq implementation
-            api_model = model if model else "llama-3.3-70b-versatile"
-            url = "https://api.groq.com/openai/v1/chat/completions"
-            headers = {
-                'Content-Type': 'application/json',
-                'Authorization': f'Bearer {self.api_key}'
-            }
-            data = {
-                "model": api_model,
-                "messages": [{"role": "user", "content": prompt}],
-                "temperature": 0.7
-            }
-            response = requests.post(url, headers=headers, json=data, timeout=20)
-            
-            if response.status_code != 200:
-                error_detail = response.text
-                print(f"Groq API Error ({response.status_code}): {error_detail}")
-                return f"ERROR: The neural core returned status {response.status_code}. (Details: {error_detail[:50]}...)"
-                
-            result = response.json()
-            return result['choices'][0]['message']['content']
+            api_model = model if model else self.router.pick(task, prompt)
+            messages = [{"role": "user", "content": prompt}]
+            params = {"temperature": 0.7}
+            if json_mode:
+                params["response_format"] = {"type": "json_object"}
+
+            async def call():
+                started = time.perf_counter()
+                completion = await self.client.chat(messages, api_model, endpoint="text", **params)
+                self.router.record(task, api_model, time.perf_counter() - started, completion.usage)
+                return completion
+
+            key = request_fingerprint("text", api_model, prompt, json_mode)
+            completion = await self.inflight.do(key, call)
+            return completion.text
+        except GroqError as e:
+            if json_mode and e.failed_generation is not None:
+                # Groq refused output that isn't valid JSON; hand it to the contract's repair/escalation
+                return e.failed_generation
+            print(f"Groq API Error ({e.status_code}): {e.detail}")
+            raise
+        except CircuitOpenError:
+            raise
         except Exception as e:
             print(f"Groq Request Exception: {e}")
             raise e
 
-    def _generate(self, prompt: str) -> str:
+    async def _call_groq_vision(self, prompt_text: str, image: PreparedImage, endpoint: str, max_tokens: int, detail: str = None) -> str:
+        """Sends a single image + instruction to the Groq vision model."""
+        model = "meta-llama/llama-4-scout-17b-16e-instruct"
+
+        async def call():
+            image_url = {"url": image.to_url()}
+            if detail:
+                image_url["detail"] = detail
+            messages = [
+                {
+                    "role": "user",
+                    "content": [
+                        {"type": "text", "text": prompt_text},
+                        {"type": "image_url", "image_url": image_url}
+                    ]
+                }
+            ]
+            return await self.client.chat(messages, model, endpoint=endpoint, max_tokens=max_tokens, temperature=0.1)
+
+        key = request_fingerprint(endpoint, model, prompt_text, image.digest, detail)
+        cached = await self.vision_cache.get(key)
+        if cached is not None:
+            return cached
+
+        completion = await self.inflight.do(key, call)
+        if completion.text:
+            await self.vision_cache.set(key, completion.text)
+        return completion.text
+
+    async def _generate(self, prompt: str, task: str = "chat", validate: Optional[Callable[[str], bool]] = None,
+                        json_mode: bool = False) -> str:
+        """Runs `prompt` on the model routed for `task`.
+
+        If `validate` rejects the output, the route may escalate once to the large model.
+        """
         try:
             if self.use_ai:
-                return self._call_groq_rest(prompt)
+                model = self.router.pick(task, prompt)
+                text = await self._call_groq_rest(prompt, model=model, task=task, json_mode=json_mode)
+                if validate is not None and not validate(text):
+                    larger = self.router.escalation(task, model)
+                    if larger:
+                        text = await self._call_groq_rest(prompt, model=larger, task=task, json_mode=json_mode)
+                return text
             else:
                 raise Exception("AI Offline")
-        except Exception as e:
-            # Check for rate limit or service unavailable
-            error_str = str(e).lower()
-            if "429" in error_str or "503" in error_str or "unavailable" in error_str:
-                print(f"Warning: Groq API experiencing high load. Switching to offline fallback.")
-                return "FALLBACK_TRIGGERED"
-            raise e
+        except CircuitOpenError:
+            return "FALLBACK_TRIGGERED"
+        except UpstreamError as e:
+            # Retries are exhausted (rate limit, outage, timeout) or the request was refused
+            print(f"Warning: Groq API unavailable ({e}). Switching to offline fallback.")
+            return "FALLBACK_TRIGGERED"
+
+    def _format_memory(self, summary: Optional[str], turns: Optional[List[dict]]) -> str:
+        """Renders the rolling summary and the recent-turn window for the prompt."""
+        if not summary and not turns:
+            return ""
+        lines = ["Conversation so far:"]
+        if summary:
+            lines.append(f"- Earlier (summary): {summary}")
+        for turn in turns or []:
+            lines.append(f"- User: {turn['message'][:MEMORY_TURN_CHARS]}")
+            lines.append(f"- AroMi: {turn['response'][:MEMORY_TURN_CHARS]}")
+        return "\n        ".join(lines)
 
-    def _build_prompt(self, message: str, context: UserContext) -> str:
+    def _build_prompt(self, message: str, context: UserContext, summary: Optional[str] = None, turns: Optional[List[dict]] = None) -> str:
         """Constructs a detailed prompt with user context."""
         goals_str = ", ".join(context.health_goals) if context.health_goals else "General wellness"
+        memory_str = self._format_memory(summary, turns)
         
         return f"""
         You are AroMi, a highly personalized, empathetic, and realistic AI Wellness Coach.
@@ -82,6 +178,8 @@ class AroMiAgent:
         - Daily Steps: {context.steps}
         - Last Meal Summary: {context.lifestyle_inputs.get('last_meal', 'Not recorded')}
         
+        {memory_str}
+        
         User's Message: "{message}"
         
         Instructions:
@@ -92,11 +190,16 @@ class AroMiAgent:
         5. For non-English inputs, acknowledge the sentiment and reply in English.
         """
 
-    def generate_response(self, message: str, context: UserContext):
+    async def generate_response(self, message: str, context: UserContext, summary: Optional[str] = None, turns: Optional[List[dict]] = None):
         try:
+            with span("intent"):
+                quick = self.intents.quick_reply(message, context)
+            if quick is not None:
+                return quick
             if self.use_ai:
-                prompt = self._build_prompt(message, context)
-                response = self._generate(prompt)
+                with span("prompt_build"):
+                    prompt = self._build_prompt(message, context, summary, turns)
+                response = await self._generate(prompt)
                 if response != "FALLBACK_TRIGGERED":
                     return response
             return self._fallback_response(message, context)
@@ -104,19 +207,43 @@ class AroMiAgent:
             print(f"Chat generation error: {e}")
             return self._fallback_response(message, context)
 
+    async def summarize_conversation(self, previous_summary: Optional[str], turns: List[dict]) -> Optional[str]:
+        """Folds older turns into the rolling summary. Returns None if it can't be updated."""
+        if not self.use_ai:
+            return None
+        transcript = "\n".join(f"User: {t['message']}\nAroMi: {t['response']}" for t in turns)
+        prompt = f"""
+        Update the running summary of a wellness coaching conversation.
+        
+        Current summary: {previous_summary or "None yet."}
+        
+        New turns:
+        {transcript}
+        
+        Write at most 120 words in third person. Keep facts that matter for future advice
+        (goals, symptoms, preferences, commitments, progress). Return only the summary text.
+        """
+        try:
+            summary = (await self._generate(prompt, task="summary")).strip()
+        except Exception as e:
+            print(f"Conversation summary error: {e}")
+            return None
+        if not summary or summary == "FALLBACK_TRIGGERED":
+            return None
+        return summary
+
     def _fallback_response(self, message: str, context: UserContext):
-        message = message.lower()
-        if "stressed" in message or context.mood == "stressed":
-             return f"I hear you, {context.name}. Since you're feeling stressed (Energy: {context.energy_level}/10), let's take a deep breath together. Want to try a quick grounding exercise?"
-        elif "workout" in message or "fitness" in message:
-             return f"For your {context.health_goals[0] if context.health_goals else 'wellness'} goal, I recommend staying active. Your current step count of {context.steps} is a great start!"
-        elif "eat" in message or "diet" in message or "food" in message:
-             return f"With a {context.lifestyle_inputs.get('diet_type', 'balanced')} diet, focus on whole foods. Since your energy is {context.energy_level}/10, try something light but sustaining."
-        return f"Hello {context.name}! I'm AroMi. I'm focusing on your {context.health_goals[0] if context.health_goals else 'wellness'} today. How can I support your journey specifically right now?"
-
-    def get_proactive_recommendation(self, context: UserContext) -> Recommendation:
+        return self.intents.reply(message, context)
+
+    async def get_proactive_recommendation(self, context: UserContext, fallback: bool = True) -> Optional[Recommendation]:
+        """Context-aware tip. With `fallback=False`, returns None instead of the offline tip."""
         if self.use_ai:
             try:
+                cache_key = f"recommendation:{context_fingerprint(context)}"
+                cached = await self.response_cache.get(cache_key)
+                if cached is not None:
+                    return Recommendation(**cached)
+
                 location_str = f"at {context.location}" if context.location else "in your area"
                 prompt = f"""
                 Generate a HIGHLY REALISTIC and ACTIONABLE health tip based on this user context:
@@ -130,31 +257,38 @@ class AroMiAgent:
                 1. Suggest a specific, immediate action.
                 2. If the user's mood or activity indicates potential health risks (e.g. very low energy, specific symptoms), include a mention of seeking professional help at nearby hospitals {location_str}.
                 
-                Format:
-                Category: [Physical/Mental/Lifestyle]
-                Suggestion: [One clear, realistic action]
-                Reasoning: [Short scientific reason + a mention of nearby medical facilities if relevant]
-                
-                Respond in this exact format.
+                Respond with a JSON object with exactly these keys:
+                {{
+                    "category": "Physical, Mental or Lifestyle",
+                    "suggestion": "One clear, realistic action",
+                    "reasoning": "Short scientific reason + a mention of nearby medical facilities if relevant"
+                }}
                 """
-                text = self._generate(prompt).strip()
-                
-                # Simple parsing
-                lines = text.split('\n')
-                cat = "General"
-                sugg = "Take a moment for yourself."
-                reas = "Self-care is important."
-                
-                for line in lines:
-                    if "Category:" in line: cat = line.split("Category:")[1].strip()
-                    if "Suggestion:" in line: sugg = line.split("Suggestion:")[1].strip()
-                    if "Reasoning:" in line: reas = line.split("Reasoning:")[1].strip()
-                    
-                return Recommendation(category=cat, suggestion=sugg, reasoning=reas)
+                contract = self.contracts["recommendation"]
+                text = await self._generate(prompt, task="recommendation", validate=contract.accepts, json_mode=True)
+                if text != "FALLBACK_TRIGGERED":
+                    defaults = self._fallback_recommendation(context).model_dump()
+                    rec, outcome = contract.parse(text, defaults=defaults)
+                    if rec is not None:
+                        # Only cache answers the model fully produced, not ones padded with defaults
+                        if outcome != PARTIAL:
+                            await self.response_cache.set(cache_key, rec.model_dump())
+                        return rec
             except Exception as e:
                 print(f"Groq recommendation error: {e}")
         
-        # Fallback recommendations
+        return self._fallback_recommendation(context) if fallback else None
+
+    def cached_recommendation(self, context: UserContext) -> Optional[Recommendation]:
+        """This worker's cached recommendation for `context`, without any I/O."""
+        cached = self.response_cache.get_local(f"recommendation:{context_fingerprint(context)}")
+        return Recommendation(**cached) if cached is not None else None
+
+    def cached_wellness_plan(self, context: UserContext) -> Optional[dict]:
+        cached = self.response_cache.get_local(f"wellness_plan:{context_fingerprint(context)}")
+        return dict(cached) if cached is not None else None
+
+    def _fallback_recommendation(self, context: UserContext) -> Recommendation:
         if context.mood == "stressed":
             return Recommendation(
                 category="Mental",
@@ -168,10 +302,18 @@ class AroMiAgent:
                 reasoning="Rehydration immediately boosts cognitive function."
             )
 
-    def generate_wellness_plan(self, context: UserContext):
-        """Generates a daily plan including tip, workout, and diet."""
+    async def generate_wellness_plan(self, context: UserContext, fallback: bool = True) -> Optional[dict]:
+        """Generates a daily plan including tip, workout, and diet.
+
+        With `fallback=False`, returns None instead of the offline plan.
+        """
         if self.use_ai:
             try:
+                cache_key = f"wellness_plan:{context_fingerprint(context)}"
+                cached = await self.response_cache.get(cache_key)
+                if cached is not None:
+                    return dict(cached)
+
                 location_str = f"near {context.location}" if context.location else "in your area"
                 prompt = f"""
                 Create a customized, HIGHLY REALISTIC daily wellness plan for:
@@ -185,18 +327,27 @@ class AroMiAgent:
                 1. The plan must be specific and actionable for today.
                 2. If the user's energy is critical or they've mentioned pain in previous context, suggest professional help {location_str}.
                 
-                Provide 3 keys in valid JSON format ONLY (no markdown backticks):
+                Respond with a JSON object with exactly these 3 keys:
                 {{
                     "daily_tip": "A realistic, science-backed motivational tip",
                     "workout_plan": "A specific exercise routine with sets/reps suitable for their energy (include a location-specific suggestion if applicable)",
                     "diet_suggestion": "A healthy, realistic meal idea based on their mood (mention hydration or local seasonal foods if possible)"
                 }}
                 """
-                text = self._generate(prompt).replace('```json', '').replace('```', '').strip()
-                return json.loads(text)
+                contract = self.contracts["wellness_plan"]
+                text = await self._generate(prompt, task="wellness_plan", validate=contract.accepts, json_mode=True)
+                if text != "FALLBACK_TRIGGERED":
+                    plan, outcome = contract.parse(text, defaults=self._fallback_wellness_plan(context))
+                    if plan is not None:
+                        if outcome != PARTIAL:
+                            await self.response_cache.set(cache_key, plan.model_dump())
+                        return plan.model_dump()
             except Exception as e:
                 print(f"Groq wellness plan error: {e}")
         
+        return self._fallback_wellness_plan(context) if fallback else None
+
+    def _fallback_wellness_plan(self, context: UserContext) -> dict:
         # Fallback Offline Plan
         plan = {
             "daily_tip": f"Listen to your body, {context.name}. Consistency beats intensity.",
@@ -212,56 +363,115 @@ class AroMiAgent:
             
         return plan
 
-    def clarify_doubt(self, question: str, context: UserContext) -> str:
+    def _build_doubt_prompt(self, question: str, context: UserContext) -> str:
+        """Constructs the clarify-doubt prompt with the user's health profile."""
+        location_str = f"near {context.location}" if context.location else "in your vicinity"
+        return f"""
+        You are AroMi, a highly specialized, empathetic, and scientifically-accurate AI Wellness Coach. 
+        User Information:
+        - Name: {context.name}
+        - Health Focus: {', '.join(context.health_goals) if context.health_goals else 'Overall health'}
+        - Current Mood: {context.mood}
+        - Location: {context.location}
+
+        The user has asked a query: "{question}"
+        
+        Guidelines:
+        1. Structure your answer clearly with bullet points if helpful.
+        2. Maintain a professional yet warm "Neural Coach" persona.
+        3. Provide REALISTIC, actionable, and specific advice based on their current location and health profile.
+        4. Ground all health advice in nutritional/biological science.
+        5. Mandatory Disclaimer: If the question involves symptoms, medications, or injuries, you MUST conclude with: 
+           "PROTOCOL ALERT: I am an AI interface, not a medical professional. Please consult a licensed physician at a nearby hospital {location_str} for clinical diagnostics."
+        6. Maximum 150 words.
+        """
+
+    def _doubt_fallback(self, question: str, context: UserContext) -> str:
+        return f"SYSTEM OFFLINE: Hello {context.name}. The neural core is currently disconnected from the Groq cloud. Regarding your query about '{question}', I recommend checking peer-reviewed sources until the link is restored."
+
+    async def clarify_doubt(self, question: str, context: UserContext) -> str:
         """Clarifies any doubts with a helpful persona using a high-performance Groq model."""
+        cached = self._cached_doubt(question, context)
+        if cached is not None:
+            return cached
         if self.use_ai:
             try:
-                # Switching to a supported high-performance model
-                model = "llama-3.3-70b-versatile"
-                location_str = f"near {context.location}" if context.location else "in your vicinity"
-                prompt = f"""
-                You are AroMi, a highly specialized, empathetic, and scientifically-accurate AI Wellness Coach. 
-                User Information:
-                - Name: {context.name}
-                - Health Focus: {', '.join(context.health_goals) if context.health_goals else 'Overall health'}
-                - Current Mood: {context.mood}
-                - Location: {context.location}
-
-                The user has asked a query: "{question}"
-                
-                Guidelines:
-                1. Structure your answer clearly with bullet points if helpful.
-                2. Maintain a professional yet warm "Neural Coach" persona.
-                3. Provide REALISTIC, actionable, and specific advice based on their current location and health profile.
-                4. Ground all health advice in nutritional/biological science.
-                5. Mandatory Disclaimer: If the question involves symptoms, medications, or injuries, you MUST conclude with: 
-                   "PROTOCOL ALERT: I am an AI interface, not a medical professional. Please consult a licensed physician at a nearby hospital {location_str} for clinical diagnostics."
-                6. Maximum 150 words.
-                """
-                return self._call_groq_rest(prompt, model=model)
+                with span("prompt_build"):
+                    prompt = self._build_doubt_prompt(question, context)
+                answer = await self._call_groq_rest(prompt, task="doubt")
+                if self.doubt_cache is not None:
+                    await self.doubt_cache.store(question, context, answer)
+                return answer
             except Exception as e:
                 print(f"Groq doubt error: {e}")
         
         # Fallback for offline mode or API issues
-        return f"SYSTEM OFFLINE: Hello {context.name}. The neural core is currently disconnected from the Groq cloud. Regarding your query about '{question}', I recommend checking peer-reviewed sources until the link is restored."
-    def analyze_prescription(self, image_data: str, context: UserContext) -> str:
+        return self._doubt_fallback(question, context)
+
+    def _cached_doubt(self, question: str, context: UserContext) -> Optional[str]:
+        if self.doubt_cache is None:
+            return None
+        with span("doubt_cache"):
+            return self.doubt_cache.lookup(question, context)
+
+    async def _stream_with_fallback(self, prompt: str, fallback: Callable[[], str], temperature: float, task: str,
+                                    on_complete: Optional[Callable[[str], Awaitable[None]]] = None):
+        """Forwards Groq tokens as they arrive; sends `fallback()` as one chunk if nothing was streamed.
+
+        `on_complete` receives the full text once Groq has streamed a complete answer.
+        """
+        streamed = False
+        if self.use_ai:
+            try:
+                messages = [{"role": "user", "content": prompt}]
+                model = self.router.pick(task, prompt)
+                started = time.perf_counter()
+                parts = []
+                async for delta in self.client.stream_chat(messages, model, endpoint="text", temperature=temperature):
+                    streamed = True
+                    parts.append(delta)
+                    yield delta
+                self.router.record(f"{task}_stream", model, time.perf_counter() - started)
+                if on_complete is not None and parts:
+                    await on_complete("".join(parts))
+            except Exception as e:
+                print(f"Groq stream error: {e}")
+        if not streamed:
+            yield fallback()
+
+    async def _single_chunk(self, text: str):
+        yield text
+
+    def stream_response(self, message: str, context: UserContext, summary: Optional[str] = None, turns: Optional[List[dict]] = None):
+        """Streaming variant of generate_response."""
+        with span("intent"):
+            quick = self.intents.quick_reply(message, context)
+        if quick is not None:
+            return self._single_chunk(quick)
+        with span("prompt_build"):
+            prompt = self._build_prompt(message, context, summary, turns)
+        return self._stream_with_fallback(prompt, lambda: self._fallback_response(message, context), temperature=0.7, task="chat")
+
+    def stream_doubt(self, question: str, context: UserContext):
+        """Streaming variant of clarify_doubt."""
+        cached = self._cached_doubt(question, context)
+        if cached is not None:
+            return self._single_chunk(cached)
+        with span("prompt_build"):
+            prompt = self._build_doubt_prompt(question, context)
+        on_complete = None
+        if self.doubt_cache is not None:
+            on_complete = lambda answer: self.doubt_cache.store(question, context, answer)
+        return self._stream_with_fallback(prompt, lambda: self._doubt_fallback(question, context), temperature=0.7,
+                                          task="doubt", on_complete=on_complete)
+
+    async def analyze_prescription(self, image_data: Union[str, bytes, PreparedImage], context: UserContext) -> str:
         """Analyzes a prescription image and provides insights, suggestions, and a food routine."""
-        print(f"DEBUG: Processing prescription analysis for {context.name}")
         if self.use_ai:
+            # Decoding/resizing is CPU-bound; ImageRejected propagates to the endpoint
+            with span("image_prepare"):
+                image = await asyncio.to_thread(prepare_image, image_data, "prescription")
             try:
-                # Ensure correct prefixing
-                if not image_data.startswith("data:image"):
-                    if image_data.startswith("/9j/"): 
-                        image_data = f"data:image/jpeg;base64,{image_data}"
-                    elif image_data.startswith("iVBORw0KGgo"): 
-                        image_data = f"data:image/png;base64,{image_data}"
-
-                url = "https://api.groq.com/openai/v1/chat/completions"
-                headers = {
-                    'Content-Type': 'application/json',
-                    'Authorization': f'Bearer {self.api_key}'
-                }
-                
                 prompt_text = f"""
                 You are AroMi, the AI Wellness Coach and Medical Data Analyst.
                 Task: Analyze the attached prescription image for {context.name}.
@@ -272,50 +482,25 @@ class AroMiAgent:
                 3. Mandatory: Finish with a disclaimer that you are an AI and to follow doctor's advice.
                 """
                 
-                data = {
-                    "model": "meta-llama/llama-4-scout-17b-16e-instruct",
-                    "messages": [
-                        {
-                            "role": "user",
-                            "content": [
-                                {"type": "text", "text": prompt_text},
-                                {"type": "image_url", "image_url": {"url": image_data}}
-                            ]
-                        }
-                    ],
-                    "max_tokens": 1024,
-                    "temperature": 0.1
-                }
-                
-                response = requests.post(url, headers=headers, json=data, timeout=60)
-                if response.status_code == 200:
-                    result = response.json()
-                    return result['choices'][0]['message']['content'] if result.get('choices') else "Empty response from AI."
-                else:
-                    print(f"DEBUG: Groq API Error {response.status_code}: {response.text}")
-                    return f"Neural Analysis Error ({response.status_code}): Image processing failed."
+                analysis = await self._call_groq_vision(prompt_text, image, "prescription", max_tokens=1024)
+                return analysis if analysis else "Empty response from AI."
+            except GroqError as e:
+                print(f"Groq prescription analysis error ({e.status_code}): {e.detail}")
+                return f"Neural Analysis Error ({e.status_code}): Image processing failed."
+            except UpstreamError:
+                return "Neural Analysis Error: The vision core is temporarily unavailable. Please try again shortly."
             except Exception as e:
-                print(f"EXCEPTION in analyze_prescription: {e}")
+                print(f"Prescription analysis error: {e}")
                 return f"Neural Processing Exception: {str(e)[:100]}"
         
         return "SYSTEM OFFLINE: Vision processing requires an active neural link (API Key)."
 
-    def analyze_meal(self, image_data: str, context: UserContext) -> str:
+    async def analyze_meal(self, image_data: Union[str, bytes, PreparedImage], context: UserContext) -> str:
         """Analyzes a meal image and provides nutritional insights using Groq Vision."""
         if self.use_ai:
+            with span("image_prepare"):
+                image = await asyncio.to_thread(prepare_image, image_data, "meal")
             try:
-                if not image_data.startswith("data:image"):
-                    if image_data.startswith("/9j/"): 
-                        image_data = f"data:image/jpeg;base64,{image_data}"
-                    elif image_data.startswith("iVBORw0KGgo"): 
-                        image_data = f"data:image/png;base64,{image_data}"
-
-                url = "https://api.groq.com/openai/v1/chat/completions"
-                headers = {
-                    'Content-Type': 'application/json',
-                    'Authorization': f'Bearer {self.api_key}'
-                }
-                
                 prompt_text = f"""
                 You are AroMi, the AI Wellness Coach.
                 Task: Analyze the attached meal image for {context.name}.
@@ -331,27 +516,9 @@ class AroMiAgent:
                 Tone: Be expert, encouraging, and brief.
                 """
                 
-                data = {
-                    "model": "meta-llama/llama-4-scout-17b-16e-instruct",
-                    "messages": [
-                        {
-                            "role": "user",
-                            "content": [
-                                {"type": "text", "text": prompt_text},
-                                {"type": "image_url", "image_url": {"url": image_data, "detail": "low"}}
-                            ]
-                        }
-                    ],
-                    "max_tokens": 800,
-                    "temperature": 0.1
-                }
-                
-                response = requests.post(url, headers=headers, json=data, timeout=30)
-                if response.status_code != 200:
-                    return f"AroMi is having trouble seeing the meal clearly right now. Please try again."
-
-                return response.json()['choices'][0]['message']['content']
-                
+                return await self._call_groq_vision(prompt_text, image, "meal", max_tokens=800, detail="low")
+            except UpstreamError:
+                return f"AroMi is having trouble seeing the meal clearly right now. Please try again."
             except Exception as e:
                 return f"I'm sorry, I encountered an error while analyzing the image."
         
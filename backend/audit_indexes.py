@@ -0,0 +1,30 @@
+"""
+Fails (exit code 1) if any handler query shape is answered by a collection scan.
+
+Usage: python audit_indexes.py
+"""
+import asyncio
+import sys
+from db import Database, audit_query_plans
+
+async def audit() -> int:
+    await Database.connect_db()
+    try:
+        report = await audit_query_plans(Database.get_db())
+    finally:
+        Database.close_db()
+
+    failures = 0
+    for entry in report:
+        status = "✗ COLLSCAN" if entry["collscan"] else "✓"
+        print(f"{status} {entry['name']}: {' <- '.join(entry['stages'])}")
+        failures += entry["collscan"]
+
+    if failures:
+        print(f"\n{failures} query shape(s) need an index. See INDEXES in db.py.")
+        return 1
+    print("\nAll query shapes are index-backed.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(audit()))
@@ -0,0 +1,133 @@
+"""
+Local stand-in for the Groq chat completions API used by the benchmark
+
+Point the backend at it with GROQ_BASE_URL=http://127.0.0.1:<port>/openai/v1.
+Behavior is set through environment variables:
+    FAKE_GROQ_LATENCY_MS         base latency per completion (default 300)
+    FAKE_GROQ_JITTER_MS          uniform jitter added on top (default 100)
+    FAKE_GROQ_SMALL_MODEL_FACTOR latency multiplier for *-instant models (default 0.35)
+    FAKE_GROQ_VISION_FACTOR      latency multiplier for image requests (default 2.5)
+    FAKE_GROQ_ERROR_RATE         share of requests answered with 503 (default 0)
+    FAKE_GROQ_STREAM_CHUNKS      deltas per streamed answer (default 20)
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, StreamingResponse
+
+LATENCY = float(os.getenv("FAKE_GROQ_LATENCY_MS", 300)) / 1000
+JITTER = float(os.getenv("FAKE_GROQ_JITTER_MS", 100)) / 1000
+SMALL_MODEL_FACTOR = float(os.getenv("FAKE_GROQ_SMALL_MODEL_FACTOR", 0.35))
+VISION_FACTOR = float(os.getenv("FAKE_GROQ_VISION_FACTOR", 2.5))
+ERROR_RATE = float(os.getenv("FAKE_GROQ_ERROR_RATE", 0))
+STREAM_CHUNKS = int(os.getenv("FAKE_GROQ_STREAM_CHUNKS", 20))
+
+app = FastAPI()
+counters = {"requests": 0, "errors": 0, "streams": 0}
+
+
+def _prompt(body: dict) -> tuple:
+    """(prompt text, whether an image was attached)"""
+    content = body["messages"][-1]["content"]
+    if isinstance(content, list):
+        text = " ".join(part.get("text", "") for part in content if part.get("type") == "text")
+        return text, True
+    return content, False
+
+
+def _answer(body: dict, prompt: str, has_image: bool) -> str:
+    if (body.get("response_format") or {}).get("type") == "json_object":
+        if "daily_tip" in prompt:
+            return json.dumps({
+                "daily_tip": "Small steps every day compound into big results.",
+                "workout_plan": "3 x 12 bodyweight squats, 3 x 10 push-ups, 10-minute brisk walk",
+                "diet_suggestion": "Grilled chicken with quinoa and a large green salad; drink 2L of water.",
+            })
+        return json.dumps({
+            "category": "Physical",
+            "suggestion": "Take a 10-minute walk outside.",
+            "reasoning": "Light movement improves circulation and mood.",
+        })
+    if has_image:
+        return ("I can see a bowl of rice with vegetables and grilled fish. Estimated 550 kcal: "
+                "protein 35g, carbohydrates 60g, fats 15g. Add a side of leafy greens for more fiber.")
+    if "Update the running summary" in prompt:
+        return "The user is working on better sleep and daily walks, and prefers short evening workouts."
+    return ("That's a great question. Based on your current energy and goals, aim for a short walk after "
+            "meals and keep hydrated through the afternoon. You're doing well, keep it up!")
+
+
+def _latency(model: str, has_image: bool) -> float:
+    seconds = LATENCY + random.uniform(0, JITTER)
+    if model.endswith("-instant"):
+        seconds *= SMALL_MODEL_FACTOR
+    if has_image:
+        seconds *= VISION_FACTOR
+    return seconds
+
+
+def _usage(prompt: str, answer: str) -> dict:
+    prompt_tokens, completion_tokens = len(prompt) // 4, len(answer) // 4
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens}
+
+
+@app.post("/openai/v1/chat/completions")
+async def chat_completions(body: dict):
+    counters["requests"] += 1
+    model = body.get("model", "")
+    prompt, has_image = _prompt(body)
+    delay = _latency(model, has_image)
+
+    if random.random() < ERROR_RATE:
+        counters["errors"] += 1
+        await asyncio.sleep(delay / 4)
+        return JSONResponse(status_code=503, content={"error": {"message": "Service unavailable (fake)"}})
+
+    answer = _answer(body, prompt, has_image)
+    if not body.get("stream"):
+        await asyncio.sleep(delay)
+        return {
+            "id": f"fake-{counters['requests']}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": answer}, "finish_reason": "stop"}],
+            "usage": _usage(prompt, answer),
+        }
+
+    counters["streams"] += 1
+
+    async def events():
+        # Time to first token is about a third of the full latency, the rest is spread over the chunks
+        await asyncio.sleep(delay / 3)
+        words = answer.split(" ")
+        size = max(1, len(words) // STREAM_CHUNKS)
+        for i in range(0, len(words), size):
+            delta = " ".join(words[i:i + size]) + (" " if i + size < len(words) else "")
+            chunk = {"model": model, "choices": [{"index": 0, "delta": {"content": delta}}]}
+            yield f"data: {json.dumps(chunk)}\n\n"
+            await asyncio.sleep(delay * 2 / 3 / STREAM_CHUNKS)
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.get("/stats")
+def stats():
+    return counters
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Fake Groq server for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    args = parser.parse_args()
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
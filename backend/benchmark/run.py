@@ -0,0 +1,308 @@
+"""
+Offline benchmark: boots the backend against the fake Groq server and drives a mixed workload
+
+Usage (from backend/):
+    python benchmark/run.py --mock-mongo --duration 30 --concurrency 32
+    python benchmark/run.py --mongodb-uri mongodb://localhost:27017/aromi_bench --budgets benchmark/budgets.json
+
+Reports requests, errors, RPS and p50/p95/p99 latency per endpoint. With --budgets the
+exit code is 1 when an endpoint exceeds its p95 budget or the error rate limit.
+"""
+import argparse
+import asyncio
+import base64
+import io
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+import httpx
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BACKEND = os.path.dirname(HERE)
+
+DEFAULT_MIX = ("chat=35,login=20,user_update=15,wellness_plan=10,chat_stream=5,"
+               "analyze_meal=5,analyze_meal_upload=5,analyze_prescription=5")
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _percentile(samples: List[float], q: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _sample_images(count: int, size: tuple) -> List[bytes]:
+    """Distinct camera-sized JPEGs, so the vision path decodes and downscales for real."""
+    from PIL import Image
+
+    images = []
+    for i in range(count):
+        rng = random.Random(i)
+        small = Image.frombytes("RGB", (64, 48), bytes(rng.randrange(256) for _ in range(64 * 48 * 3)))
+        buffer = io.BytesIO()
+        small.resize(size).save(buffer, format="JPEG", quality=90)
+        images.append(buffer.getvalue())
+    return images
+
+
+def _data_url(image: bytes) -> str:
+    return "data:image/jpeg;base64," + base64.b64encode(image).decode()
+
+
+def _profile(i: int) -> dict:
+    email = f"bench{i}@example.com"
+    return {
+        "user_id": email.replace("@", "_").replace(".", "_"),
+        "email": email,
+        "password": "bench-password",
+        "name": f"Bench User {i}",
+        "age": 20 + i % 40,
+        "mood": random.choice(["happy", "neutral", "stressed", "tired"]),
+        "energy_level": random.randint(2, 9),
+        "activity_type": random.choice(["sedentary", "walking", "workout"]),
+        "health_goals": random.choice([["Lose weight"], ["Sleep better"], ["Build muscle", "Reduce stress"]]),
+        "steps": random.randint(0, 12000),
+        "location": random.choice([None, "Hyderabad", "Bengaluru"]),
+    }
+
+
+class Workload:
+    def __init__(self, client: httpx.AsyncClient, users: List[dict], meal_images: List[bytes], prescription_images: List[bytes]):
+        self.client = client
+        self.users = users
+        self.meal_images = meal_images
+        self.prescription_images = prescription_images
+        # The JSON endpoints take base64 data URLs
+        self.meal_urls = [_data_url(image) for image in meal_images]
+        self.prescription_urls = [_data_url(image) for image in prescription_images]
+
+    def _request(self, name: str, user: dict):
+        context = {k: v for k, v in user.items() if k != "email"}
+        # Agent endpoints use the server-side session context plus a small delta, like the frontend
+        delta = {"mood": user["mood"], "energy_level": user["energy_level"], "steps": user["steps"]}
+        if name == "chat":
+            return "POST", "/chat", {"user_id": user["user_id"], "message": random.choice(
+                ["How can I sleep better?", "I feel tired today", "What should I eat after a workout?"]), "context_delta": delta}
+        if name == "chat_stream":
+            return "POST", "/chat/stream", {"user_id": user["user_id"], "message": "Any tips for today?", "context_delta": delta}
+        if name == "login":
+            return "POST", "/login", {"email": user["email"], "password": user["password"]}
+        if name == "user_update":
+            context["steps"] = user["steps"] = user["steps"] + random.randint(0, 500)
+            return "POST", "/user/update", context
+        if name == "wellness_plan":
+            return "POST", "/wellness-plan", context
+        if name == "recommendation":
+            return "POST", "/recommendation", context
+        if name == "analyze_meal":
+            return "POST", "/analyze-meal", {"user_id": user["user_id"], "image_data": random.choice(self.meal_urls), "context_delta": delta}
+        if name == "analyze_prescription":
+            return "POST", "/analyze-prescription", {"user_id": user["user_id"], "image_data": random.choice(self.prescription_urls), "context_delta": delta}
+        if name == "analyze_meal_upload":
+            return "POST", "/analyze-meal/upload", {
+                "data": {"user_id": user["user_id"], "context_delta": json.dumps(delta)},
+                "files": {"file": ("meal.jpg", random.choice(self.meal_images), "image/jpeg")},
+            }
+        raise ValueError(f"Unknown endpoint in mix: {name}")
+
+    async def call(self, name: str) -> int:
+        user = random.choice(self.users)
+        method, path, body = self._request(name, user)
+        headers = {"X-User-Id": user["user_id"]}
+        if name == "chat_stream":
+            async with self.client.stream(method, path, json=body, headers=headers) as response:
+                async for _ in response.aiter_bytes():
+                    pass
+                return response.status_code
+        if name.endswith("_upload"):
+            response = await self.client.request(method, path, headers=headers, **body)
+        else:
+            response = await self.client.request(method, path, json=body, headers=headers)
+        return response.status_code
+
+
+async def _wait_ready(url: str, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(url)).status_code < 500:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.25)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+async def drive(args, base_url: str) -> dict:
+    mix = {}
+    for item in args.mix.split(","):
+        name, _, weight = item.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    names, weights = list(mix), list(mix.values())
+
+    limits = httpx.Limits(max_connections=args.concurrency * 2, max_keepalive_connections=args.concurrency * 2)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        users = [_profile(i) for i in range(args.users)]
+        for user in users:
+            await client.post("/signup", json={k: v for k, v in user.items() if k != "email"})
+        workload = Workload(
+            client, users,
+            meal_images=_sample_images(args.image_variants, (1280, 960)),
+            prescription_images=_sample_images(args.image_variants, (2000, 1500)),
+        )
+
+        latencies: Dict[str, List[float]] = {name: [] for name in names}
+        errors: Dict[str, int] = {name: 0 for name in names}
+
+        async def worker(deadline: float, record: bool):
+            while time.monotonic() < deadline:
+                name = random.choices(names, weights)[0]
+                started = time.perf_counter()
+                try:
+                    status = await workload.call(name)
+                except httpx.HTTPError:
+                    status = 0
+                if record:
+                    latencies[name].append(time.perf_counter() - started)
+                    if status >= 400 or status == 0:
+                        errors[name] += 1
+
+        if args.warmup > 0:
+            deadline = time.monotonic() + args.warmup
+            await asyncio.gather(*(worker(deadline, False) for _ in range(args.concurrency)))
+
+        started = time.monotonic()
+        deadline = started + args.duration
+        await asyncio.gather(*(worker(deadline, True) for _ in range(args.concurrency)))
+        elapsed = time.monotonic() - started
+        app_stats = (await client.get("/stats")).json()
+
+    endpoints = {}
+    for name in names:
+        samples = latencies[name]
+        endpoints[name] = {
+            "requests": len(samples),
+            "errors": errors[name],
+            "rps": round(len(samples) / elapsed, 2),
+            "p50_ms": round(_percentile(samples, 0.50) * 1000, 1),
+            "p95_ms": round(_percentile(samples, 0.95) * 1000, 1),
+            "p99_ms": round(_percentile(samples, 0.99) * 1000, 1),
+        }
+    total = sum(e["requests"] for e in endpoints.values())
+    total_errors = sum(e["errors"] for e in endpoints.values())
+    return {
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "budgets")},
+        "elapsed_s": round(elapsed, 2),
+        "total": {
+            "requests": total,
+            "errors": total_errors,
+            "error_rate": round(total_errors / total, 4) if total else 0.0,
+            "rps": round(total / elapsed, 2),
+        },
+        "endpoints": endpoints,
+        "app_stats": app_stats,
+    }
+
+
+def print_report(result: dict):
+    print(f"\n{'endpoint':<22}{'requests':>10}{'errors':>8}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, e in result["endpoints"].items():
+        print(f"{name:<22}{e['requests']:>10}{e['errors']:>8}{e['rps']:>9}{e['p50_ms']:>10}{e['p95_ms']:>10}{e['p99_ms']:>10}")
+    t = result["total"]
+    print(f"{'total':<22}{t['requests']:>10}{t['errors']:>8}{t['rps']:>9}")
+
+
+def check_budgets(result: dict, budgets: dict) -> List[str]:
+    violations = []
+    max_error_rate = budgets.get("max_error_rate")
+    if max_error_rate is not None and result["total"]["error_rate"] > max_error_rate:
+        violations.append(f"error rate {result['total']['error_rate']} > {max_error_rate}")
+    for name, budget in budgets.get("p95_ms", {}).items():
+        endpoint = result["endpoints"].get(name)
+        if endpoint and endpoint["requests"] and endpoint["p95_ms"] > budget:
+            violations.append(f"{name}: p95 {endpoint['p95_ms']}ms > {budget}ms")
+    return violations
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the backend against a local fake Groq server")
+    parser.add_argument("--duration", type=float, default=30, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="unmeasured seconds before the run")
+    parser.add_argument("--concurrency", type=int, default=32, help="concurrent virtual clients")
+    parser.add_argument("--users", type=int, default=50, help="distinct seeded users")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="endpoint=weight,... (also: recommendation)")
+    parser.add_argument("--image-variants", type=int, default=8)
+    parser.add_argument("--mock-mongo", action="store_true", help="use mongomock instead of a MongoDB server")
+    parser.add_argument("--mongodb-uri", default="mongodb://localhost:27017/aromi_bench")
+    parser.add_argument("--groq-latency-ms", type=float, default=300)
+    parser.add_argument("--groq-jitter-ms", type=float, default=100)
+    parser.add_argument("--groq-error-rate", type=float, default=0.0)
+    parser.add_argument("--groq-stream-chunks", type=int, default=20)
+    parser.add_argument("--rate-limit", action="store_true", help="keep the API rate limiter enabled")
+    parser.add_argument("--output", help="write the JSON result here")
+    parser.add_argument("--budgets", help="JSON file with p95_ms per endpoint and max_error_rate")
+    args = parser.parse_args()
+
+    groq_port, app_port = _free_port(), _free_port()
+    env = {
+        **os.environ,
+        "FAKE_GROQ_LATENCY_MS": str(args.groq_latency_ms),
+        "FAKE_GROQ_JITTER_MS": str(args.groq_jitter_ms),
+        "FAKE_GROQ_ERROR_RATE": str(args.groq_error_rate),
+        "FAKE_GROQ_STREAM_CHUNKS": str(args.groq_stream_chunks),
+        "GROQ_BASE_URL": f"http://127.0.0.1:{groq_port}/openai/v1",
+        "GROQ_API_KEY": os.getenv("BENCH_GROQ_API_KEY", "gsk_benchmark_fake_key"),
+        "MONGODB_URI": args.mongodb_uri,
+        "RATE_LIMIT_ENABLED": "1" if args.rate_limit else "0",
+        # Measure the live generation path; an off-peak pass would also skew timings
+        "PRECOMPUTE_ENABLED": "0",
+    }
+    processes = [
+        subprocess.Popen([sys.executable, os.path.join(HERE, "fake_groq.py"), "--port", str(groq_port)], env=env, cwd=BACKEND),
+        subprocess.Popen(
+            [sys.executable, os.path.join(HERE, "serve_app.py"), "--port", str(app_port)]
+            + (["--mock-mongo"] if args.mock_mongo else []),
+            env=env, cwd=BACKEND,
+        ),
+    ]
+    try:
+        asyncio.run(_wait_ready(f"http://127.0.0.1:{groq_port}/stats"))
+        asyncio.run(_wait_ready(f"http://127.0.0.1:{app_port}/"))
+        result = asyncio.run(drive(args, f"http://127.0.0.1:{app_port}"))
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=30)
+
+    print_report(result)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2, default=str)
+
+    if args.budgets:
+        with open(args.budgets) as f:
+            violations = check_budgets(result, json.load(f))
+        if violations:
+            print("\n✗ Benchmark budgets exceeded:")
+            for violation in violations:
+                print(f"  - {violation}")
+            sys.exit(1)
+        print("\n✓ Within benchmark budgets")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Runs main.app for the benchmark, optionally on an in-memory MongoDB stand-in (mongomock)
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def use_mongomock():
+    """Swaps the Motor client for mongomock-motor so no MongoDB server is needed."""
+    from mongomock.database import Database as MockDatabase
+    from mongomock_motor import AsyncMongoMockClient
+
+    from db import Database
+
+    client = AsyncMongoMockClient()
+
+    async def connect_db(cls):
+        cls.client = client
+        cls.db = client["aromi_bench"]
+        print("✓ Using in-memory MongoDB stand-in (mongomock)")
+        await cls.ensure_indexes()
+
+    def close_db(cls):
+        pass
+
+    Database.connect_db = classmethod(connect_db)
+    Database.close_db = classmethod(close_db)
+
+    # mongomock has no time-series collections; fall back to a regular one
+    create_collection = MockDatabase.create_collection
+    MockDatabase.create_collection = lambda self, name, **options: create_collection(self, name)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve the backend for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--mock-mongo", action="store_true")
+    args = parser.parse_args()
+
+    if args.mock_mongo:
+        use_mongomock()
+    from main import app
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
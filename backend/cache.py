@@ -0,0 +1,183 @@
+"""
+Response caching for context-keyed LLM outputs
+"""
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Iterable, Optional
+
+from models import UserContext
+from tracing import span
+
+# The only UserContext fields the recommendation and wellness plan prompts read
+PROMPT_CONTEXT_FIELDS = ("name", "mood", "energy_level", "activity_type", "location")
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, str):
+        return " ".join(value.lower().split())
+    if isinstance(value, (list, tuple)):
+        return sorted(_normalize(v) for v in value)
+    return value
+
+
+def context_fingerprint(context: UserContext, fields: Iterable[str] = PROMPT_CONTEXT_FIELDS) -> str:
+    """Stable hash of the normalized prompt-relevant context fields."""
+    normalized = {name: _normalize(getattr(context, name, None)) for name in fields}
+    raw = json.dumps(normalized, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class TTLCache:
+    """In-process LRU cache whose entries also expire after `ttl` seconds."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        self._data[key] = (time.monotonic() + (ttl if ttl is not None else self.ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key: str):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class MongoCacheBackend:
+    """Shared cache layer in a MongoDB collection so several workers see each other's entries.
+
+    With `max_entries` set, the least recently used documents are evicted once the
+    collection grows past that size.
+    """
+
+    def __init__(self, collection, ttl: float, max_entries: Optional[int] = None):
+        self.collection = collection
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.evictions = 0
+
+    async def ensure_indexes(self):
+        # MongoDB's TTL monitor removes documents once expires_at has passed
+        await self.collection.create_index("expires_at", expireAfterSeconds=0)
+        if self.max_entries:
+            await self.collection.create_index("last_access")
+
+    async def get(self, key: str) -> Optional[Any]:
+        now = datetime.now(timezone.utc)
+        query = {"_id": key, "expires_at": {"$gt": now}}
+        with span("mongo"):
+            if self.max_entries:
+                doc = await self.collection.find_one_and_update(
+                    query, {"$set": {"last_access": now}}, projection={"value": 1}
+                )
+            else:
+                doc = await self.collection.find_one(query, {"value": 1})
+        return doc["value"] if doc else None
+
+    async def set(self, key: str, value: Any):
+        now = datetime.now(timezone.utc)
+        with span("mongo"):
+            await self.collection.update_one(
+                {"_id": key},
+                {"$set": {"value": value, "expires_at": now + timedelta(seconds=self.ttl), "last_access": now}},
+                upsert=True
+            )
+        if self.max_entries:
+            await self._evict()
+
+    async def _evict(self):
+        excess = await self.collection.estimated_document_count() - self.max_entries
+        if excess <= 0:
+            return
+        cursor = self.collection.find({}, {"_id": 1}).sort("last_access", 1).limit(excess)
+        stale = [doc["_id"] async for doc in cursor]
+        if stale:
+            result = await self.collection.delete_many({"_id": {"$in": stale}})
+            self.evictions += result.deleted_count
+
+
+class ResponseCache:
+    """Two-level cache: in-process LRU first, then the optional shared backend."""
+
+    def __init__(self, name: str, maxsize: int, ttl: float):
+        self.name = name
+        self.local = TTLCache(maxsize, ttl)
+        self.shared: Optional[MongoCacheBackend] = None
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    async def attach_shared(self, collection, max_entries: Optional[int] = None):
+        backend = MongoCacheBackend(collection, self.local.ttl, max_entries)
+        await backend.ensure_indexes()
+        self.shared = backend
+
+    async def get(self, key: str) -> Optional[Any]:
+        value = self.local.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        if self.shared is not None:
+            try:
+                value = await self.shared.get(key)
+            except Exception as e:
+                print(f"Shared cache read error ({self.name}): {e}")
+                value = None
+            if value is not None:
+                self.hits += 1
+                self.shared_hits += 1
+                self.local.set(key, value)
+                return value
+
+        self.misses += 1
+        return None
+
+    def get_local(self, key: str) -> Optional[Any]:
+        """In-process lookup only, skipping the shared backend; misses aren't counted."""
+        value = self.local.get(key)
+        if value is not None:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: Any):
+        self.local.set(key, value)
+        if self.shared is not None:
+            try:
+                await self.shared.set(key, value)
+            except Exception as e:
+                print(f"Shared cache write error ({self.name}): {e}")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.local),
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "shared_backend": self.shared is not None,
+            "shared_evictions": self.shared.evictions if self.shared is not None else 0,
+        }
@@ -0,0 +1,173 @@
+"""
+Chat history retrieval and bounded conversation memory
+"""
+import asyncio
+import base64
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from bson import ObjectId
+
+from cache import TTLCache
+from db import ensure_ttl_index
+from tracing import span
+
+HISTORY_PROJECTION = {"message": 1, "response": 1, "timestamp": 1}
+
+
+def encode_cursor(doc: dict) -> str:
+    raw = f"{doc['timestamp'].isoformat()}|{doc['_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    try:
+        timestamp, _, oid = base64.urlsafe_b64decode(cursor.encode()).decode().partition("|")
+        return datetime.fromisoformat(timestamp), ObjectId(oid)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def _position(doc: dict) -> Tuple[datetime, ObjectId]:
+    """(timestamp, _id) in UTC, the key history pages are ordered by."""
+    timestamp = doc["timestamp"]
+    timestamp = timestamp.replace(tzinfo=timezone.utc) if timestamp.tzinfo is None else timestamp.astimezone(timezone.utc)
+    return timestamp, doc["_id"]
+
+
+def _turn(doc: dict) -> dict:
+    timestamp = doc.get("timestamp")
+    if isinstance(timestamp, datetime):
+        timestamp = timestamp.replace(tzinfo=timezone.utc).isoformat() if timestamp.tzinfo is None else timestamp.isoformat()
+    return {
+        "id": str(doc["_id"]) if "_id" in doc else None,
+        "message": doc.get("message", ""),
+        "response": doc.get("response", ""),
+        "timestamp": timestamp,
+    }
+
+
+class ConversationMemory:
+    """Serves chat history pages and the memory fed into the chat prompt.
+
+    The prompt gets the last `window` turns verbatim plus a rolling summary of
+    everything older. The summary is refreshed in the background once
+    `compact_after` turns have fallen out of the window, so prompt size stays flat.
+    """
+
+    def __init__(self, buffer, window: int, compact_after: int, summary_ttl: float,
+                 summarize: Callable[[Optional[str], List[dict]], Awaitable[Optional[str]]]):
+        self.buffer = buffer  # Write-behind buffer holding turns not yet in MongoDB
+        self.window = window
+        self.compact_after = compact_after
+        self.summarize = summarize
+        self.history = None
+        self.summaries = None
+        self._summary_cache = TTLCache(maxsize=10000, ttl=summary_ttl)
+        self._turns_since_check: dict = {}
+        self._compacting: set = set()
+        self.compactions = 0
+
+    async def attach(self, history_collection, summaries_collection, retention_days: int = 0):
+        self.history = history_collection
+        self.summaries = summaries_collection
+        await self.summaries.create_index("user_id", unique=True)
+        # 0 drops a TTL index left from an earlier retention setting
+        await ensure_ttl_index(self.history, "timestamp", retention_days * 24 * 3600)
+
+    async def page(self, user_id: str, limit: int, cursor: Optional[str] = None) -> dict:
+        """Newest-first page of turns using keyset pagination on (timestamp, _id)."""
+        query = {"user_id": user_id}
+        # Turns still sitting in the write-behind buffer are the newest ones
+        buffered = [doc for doc in reversed(self.buffer.pending_for("user_id", user_id)) if "_id" in doc]
+        if cursor:
+            timestamp, oid = decode_cursor(cursor)
+            query["$or"] = [
+                {"timestamp": {"$lt": timestamp}},
+                {"timestamp": timestamp, "_id": {"$lt": oid}},
+            ]
+            position = _position({"timestamp": timestamp, "_id": oid})
+            buffered = [doc for doc in buffered if _position(doc) < position]
+
+        docs = []
+        if len(buffered) < limit:
+            with span("mongo"):
+                docs = await self.history.find(query, HISTORY_PROJECTION) \
+                    .sort([("timestamp", -1), ("_id", -1)]).limit(limit).to_list(length=limit)
+        # A turn flushed while we read can show up in both
+        seen = {doc["_id"] for doc in buffered}
+        merged = sorted(buffered + [doc for doc in docs if doc["_id"] not in seen], key=_position, reverse=True)
+        returned = merged[:limit]
+        has_more = len(merged) > limit or len(docs) == limit or len(buffered) >= limit
+        last = returned[-1] if returned else {}
+        next_cursor = encode_cursor(last) if has_more and last.get("_id") and last.get("timestamp") else None
+        return {"items": [_turn(doc) for doc in returned], "next_cursor": next_cursor}
+
+    async def recent_turns(self, user_id: str) -> List[dict]:
+        """The last `window` turns, oldest first."""
+        pending = self.buffer.pending_for("user_id", user_id)[-self.window:]
+        needed = self.window - len(pending)
+        docs = []
+        if needed > 0:
+            with span("mongo"):
+                docs = await self.history.find({"user_id": user_id}, HISTORY_PROJECTION) \
+                    .sort("timestamp", -1).limit(needed).to_list(length=needed)
+        return [_turn(doc) for doc in reversed(docs)] + [_turn(doc) for doc in pending]
+
+    async def _summary_doc(self, user_id: str) -> Optional[dict]:
+        doc = self._summary_cache.get(user_id)
+        if doc is None:
+            with span("mongo"):
+                doc = await self.summaries.find_one({"user_id": user_id}, {"_id": 0}) or {}
+            self._summary_cache.set(user_id, doc)
+        return doc or None
+
+    async def load(self, user_id: str) -> Tuple[Optional[str], List[dict]]:
+        """(rolling summary, recent turns) for the chat prompt."""
+        summary_doc, turns = await asyncio.gather(self._summary_doc(user_id), self.recent_turns(user_id))
+        return (summary_doc or {}).get("summary"), turns
+
+    def note_turn(self, user_id: str):
+        """Called after each stored turn; checks for compaction every `window` turns."""
+        count = self._turns_since_check.get(user_id, 0) + 1
+        if count < self.window or user_id in self._compacting:
+            self._turns_since_check[user_id] = count
+            return
+        self._turns_since_check.pop(user_id, None)
+        self._compacting.add(user_id)
+        task = asyncio.create_task(self._compact(user_id))
+        task.add_done_callback(lambda _: self._compacting.discard(user_id))
+
+    async def _compact(self, user_id: str):
+        try:
+            summary_doc = await self._summary_doc(user_id) or {}
+            # Turns older than the verbatim window and newer than what's summarized
+            window_docs = await self.history.find({"user_id": user_id}, {"timestamp": 1}) \
+                .sort("timestamp", -1).skip(self.window - 1).limit(1).to_list(length=1)
+            if not window_docs:
+                return
+            query = {"user_id": user_id, "timestamp": {"$lt": window_docs[0]["timestamp"]}}
+            if summary_doc.get("until"):
+                query["timestamp"]["$gt"] = summary_doc["until"]
+            older = await self.history.find(query, HISTORY_PROJECTION) \
+                .sort("timestamp", 1).limit(self.compact_after * 4).to_list(length=self.compact_after * 4)
+            if len(older) < self.compact_after:
+                return
+
+            summary = await self.summarize(summary_doc.get("summary"), older)
+            if not summary:
+                return
+            doc = {"user_id": user_id, "summary": summary, "until": older[-1]["timestamp"]}
+            await self.summaries.update_one({"user_id": user_id}, {"$set": doc}, upsert=True)
+            self._summary_cache.set(user_id, doc)
+            self.compactions += 1
+        except Exception as e:
+            print(f"Conversation compaction error for {user_id}: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "window": self.window,
+            "cached_summaries": len(self._summary_cache),
+            "compactions": self.compactions,
+            "compacting": len(self._compacting),
+        }
@@ -2,15 +2,59 @@
 Database connection module for MongoDB
 """
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
-from typing import Optional
+from pymongo import ASCENDING, DESCENDING
+from bson import ObjectId
+from datetime import datetime
+from typing import List, Optional
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Indexes the request handlers rely on: collection -> [(keys, options)]
+INDEXES = {
+    "users": [
+        ([("user_id", ASCENDING)], {"unique": True, "name": "user_id_unique"}),
+        # Active-user walk of the precompute scheduler
+        ([("last_active", DESCENDING)], {"name": "last_active"}),
+    ],
+    "chat_history": [
+        # _id breaks timestamp ties for keyset pagination
+        ([("user_id", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)], {"name": "user_id_timestamp_id"}),
+    ],
+    # Precomputed results, one document per user
+    "wellness_plans": [
+        ([("user_id", ASCENDING)], {"unique": True, "name": "user_id_unique"}),
+    ],
+    "recommendations": [
+        ([("user_id", ASCENDING)], {"unique": True, "name": "user_id_unique"}),
+    ],
+}
+
+# Query shapes issued by the handlers in main.py, audited by audit_indexes.py
+QUERY_SHAPES = [
+    # get_user, login_endpoint, signup_endpoint, update_user, chat_endpoint
+    {"name": "users by user_id", "collection": "users", "filter": {"user_id": "audit_user"}},
+    {"name": "chat_history by user, newest first", "collection": "chat_history",
+     "filter": {"user_id": "audit_user"}, "sort": {"timestamp": -1}},
+    # GET /chat/history with a cursor
+    {"name": "chat_history keyset page", "collection": "chat_history",
+     "filter": {"user_id": "audit_user", "$or": [
+         {"timestamp": {"$lt": datetime(2000, 1, 1)}},
+         {"timestamp": datetime(2000, 1, 1), "_id": {"$lt": ObjectId("000000000000000000000000")}},
+     ]}, "sort": {"timestamp": -1, "_id": -1}},
+    # PrecomputeScheduler.run_pass
+    {"name": "users active since", "collection": "users", "filter": {"last_active": {"$gte": datetime(2000, 1, 1)}}},
+    # /wellness-plan and /recommendation precomputed reads
+    {"name": "wellness_plans by user_id", "collection": "wellness_plans", "filter": {"user_id": "audit_user"}},
+    {"name": "recommendations by user_id", "collection": "recommendations", "filter": {"user_id": "audit_user"}},
+]
+
 class Database:
     client: Optional[AsyncIOMotorClient] = None
     db: Optional[AsyncIOMotorDatabase] = None
+    # (collection, index name) pairs from INDEXES that could not be built
+    missing_indexes: set = set()
 
     @classmethod
     async def connect_db(cls):
@@ -35,6 +79,26 @@ class Database:
             print(f"✗ MongoDB Connection Error: {e}")
             raise e
 
+        await cls.ensure_indexes()
+
+    @classmethod
+    async def ensure_indexes(cls):
+        """Create the indexes the handlers rely on (no-op when they already exist)"""
+        for collection, indexes in INDEXES.items():
+            for keys, options in indexes:
+                try:
+                    await cls.db.get_collection(collection).create_index(keys, **options)
+                    cls.missing_indexes.discard((collection, options["name"]))
+                except Exception as e:
+                    # e.g. duplicate user_ids left over from before the unique index
+                    print(f"✗ Index creation failed on {collection} ({options.get('name')}): {e}")
+                    cls.missing_indexes.add((collection, options["name"]))
+
+    @classmethod
+    def has_index(cls, collection: str, name: str) -> bool:
+        """False when ensure_indexes could not build this index"""
+        return (collection, name) not in cls.missing_indexes
+
     @classmethod
     def close_db(cls):
         """Close MongoDB connection"""
@@ -50,3 +114,50 @@ class Database:
 # Get database instance
 def get_database() -> AsyncIOMotorDatabase:
     return Database.get_db()
+
+async def ensure_ttl_index(collection, field: str, expire_after_seconds: int):
+    """Makes the TTL index on `field` match `expire_after_seconds`; 0 drops it (no expiry).
+
+    A changed TTL is applied in place with collMod, since create_index with new
+    options fails (IndexOptionsConflict). Failures are logged, not raised.
+    """
+    try:
+        existing = [
+            (name, info) for name, info in (await collection.index_information()).items()
+            if [key for key, _ in info["key"]] == [field]
+        ]
+        name, info = existing[0] if existing else (None, {})
+        if not expire_after_seconds:
+            if "expireAfterSeconds" in info:
+                await collection.drop_index(name)
+        elif name is None:
+            await collection.create_index(field, expireAfterSeconds=expire_after_seconds)
+        elif info.get("expireAfterSeconds") != expire_after_seconds:
+            await collection.database.command({
+                "collMod": collection.name,
+                "index": {"keyPattern": {field: 1}, "expireAfterSeconds": expire_after_seconds},
+            })
+    except Exception as e:
+        print(f"✗ TTL index update failed on {collection.name} ({field}): {e}")
+
+def _plan_stages(plan: dict) -> List[str]:
+    """Flatten the stage names of an explain() winning plan"""
+    stages = [plan.get("stage")]
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            stages += _plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        stages += _plan_stages(child)
+    return [s for s in stages if s]
+
+async def audit_query_plans(db: AsyncIOMotorDatabase) -> List[dict]:
+    """Explain every known query shape and report the winning plan's stages"""
+    report = []
+    for shape in QUERY_SHAPES:
+        command = {"find": shape["collection"], "filter": shape["filter"]}
+        if "sort" in shape:
+            command["sort"] = shape["sort"]
+        explained = await db.command("explain", command, verbosity="queryPlanner")
+        stages = _plan_stages(explained["queryPlanner"]["winningPlan"])
+        report.append({"name": shape["name"], "stages": stages, "collscan": "COLLSCAN" in stages})
+    return report
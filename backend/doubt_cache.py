@@ -0,0 +1,226 @@
+"""
+Near-duplicate question cache for /clarify-doubt answers
+"""
+import hashlib
+import os
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from db import ensure_ttl_index
+from intents import TfidfModel, normalize
+from metrics import LatencyWindow
+from models import UserContext
+from tracing import span
+
+# Words that carry no meaning for matching ("how much water should I drink" -> "water intake")
+STOPWORDS = frozenset("""
+a an the i i'm im me my mine is am are was be been being do does did should shall can could would will
+to of for in on at by from about into how what which when why who much many per day daily every
+it its it's this that these those and or but if so you your please tell know need want get really
+""".split())
+
+# Negation/polarity words: never dropped as stopwords ("with" vs "without alcohol")
+POLARITY_WORDS = frozenset("""
+not no never without with stop avoid before after don't dont doesn't doesnt can't cant shouldn't shouldnt
+isn't isnt won't wont nor none instead less more
+""".split())
+
+# Phrasing variants folded onto one token so they index together
+SYNONYMS = {
+    "drink": "intake", "drinking": "intake", "consume": "intake", "consumption": "intake",
+    "eat": "intake", "eating": "intake",
+    "hrs": "hours", "hour": "hours",
+    "workout": "exercise", "workouts": "exercise", "exercises": "exercise", "exercising": "exercise",
+    "kg": "weight", "kilos": "weight",
+}
+
+# Stored answers have the asker's name swapped for this, and the reader's name put back on a hit
+NAME_PLACEHOLDER = "{{name}}"
+
+
+def question_key(question: str) -> str:
+    """Content words of the question, stopwords dropped and synonyms folded."""
+    words = (SYNONYMS.get(word, word) for word in normalize(question).split())
+    return " ".join(word for word in words if word in POLARITY_WORDS or word not in STOPWORDS)
+
+
+def _content_words(key: str) -> frozenset:
+    """The key's words with plurals folded ("foods" -> "food"); order and repeats don't matter."""
+    return frozenset(
+        word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word
+        for word in key.split()
+    )
+
+
+def scope_key(context: UserContext) -> str:
+    """Answers are only reused between askers with the same goals and location."""
+    goals = sorted(" ".join(goal.lower().split()) for goal in context.health_goals or [])
+    location = " ".join((context.location or "").lower().split())
+    return hashlib.sha256(f"{'|'.join(goals)}#{location}".encode()).hexdigest()[:16]
+
+
+@dataclass
+class _Entry:
+    scope: str
+    key: str
+    answer: str
+    vector: Dict[str, float]
+    created_at: float
+
+
+class DoubtCache:
+    """Reuses an answer when a new question is similar enough to one already answered.
+
+    Questions become TF-IDF vectors over their content words, indexed per context
+    scope in an inverted index, so a lookup touches only entries that share a term.
+    A candidate above the threshold is only served when both questions have the same
+    content words (after synonym and plural folding): one differing word barely moves
+    the score of a long question, but can make it a different medical question.
+    Questions with the same key skip scoring entirely.
+    The in-memory index is an LRU bounded to `maxsize`; entries are persisted to
+    MongoDB (expiring after `ttl`) and the newest ones are reloaded at startup.
+    """
+
+    def __init__(self, model: TfidfModel, maxsize: int, threshold: float, ttl: float):
+        self.model = model
+        self.maxsize = maxsize
+        self.threshold = threshold
+        self.ttl = ttl
+        self.collection = None
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._postings: Dict[str, Dict[str, Dict[str, float]]] = {}  # scope -> term -> {entry_id: weight}
+        self.latency = LatencyWindow()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls, model: TfidfModel) -> Optional["DoubtCache"]:
+        if os.getenv("DOUBT_CACHE_ENABLED", "1") != "1":
+            return None
+        return cls(
+            model,
+            maxsize=int(os.getenv("DOUBT_CACHE_MAX_ENTRIES", 5000)),
+            threshold=float(os.getenv("DOUBT_CACHE_THRESHOLD", 0.8)),
+            ttl=float(os.getenv("DOUBT_CACHE_TTL", 7 * 24 * 3600)),
+        )
+
+    async def attach(self, collection):
+        """Persists entries to `collection` and loads the newest ones into memory."""
+        self.collection = collection
+        # MongoDB's TTL monitor drops answers older than the cache TTL
+        await ensure_ttl_index(collection, "created_at", int(self.ttl))
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.ttl)
+        with span("mongo"):
+            docs = await collection.find({"created_at": {"$gt": cutoff}}) \
+                .sort("created_at", -1).limit(self.maxsize).to_list(length=None)
+        for doc in reversed(docs):
+            created = doc["created_at"].replace(tzinfo=timezone.utc).timestamp()
+            self._add(doc["_id"], doc["scope"], doc["key"], doc["answer"], created)
+        print(f"✓ Doubt cache loaded {len(docs)} answers")
+
+    def lookup(self, question: str, context: UserContext) -> Optional[str]:
+        """Returns the cached answer (addressed to this asker) for a near-duplicate question."""
+        started = time.perf_counter()
+        entry = self._closest(scope_key(context), question_key(question))
+        self.latency.record((time.perf_counter() - started) * 1e6)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry.answer.replace(NAME_PLACEHOLDER, context.name or "there")
+
+    async def store(self, question: str, context: UserContext, answer: str):
+        key = question_key(question)
+        if not key or not answer:
+            return
+        scope = scope_key(context)
+        if context.name:
+            answer = re.sub(rf"\b{re.escape(context.name)}\b", NAME_PLACEHOLDER, answer)
+        entry_id = self._entry_id(scope, key)
+        self._add(entry_id, scope, key, answer, time.time())
+        self.stores += 1
+        if self.collection is None:
+            return
+        try:
+            with span("mongo"):
+                await self.collection.update_one(
+                    {"_id": entry_id},
+                    {"$set": {"scope": scope, "key": key, "answer": answer,
+                              "created_at": datetime.now(timezone.utc)}},
+                    upsert=True,
+                )
+        except Exception as e:
+            print(f"Doubt cache write error: {e}")
+
+    @staticmethod
+    def _entry_id(scope: str, key: str) -> str:
+        return hashlib.sha256(f"{scope}#{key}".encode()).hexdigest()
+
+    def _closest(self, scope: str, key: str) -> Optional[_Entry]:
+        postings = self._postings.get(scope)
+        if not postings or not key:
+            return None
+        # Same content words after normalization: no scoring needed
+        entry_id = self._entry_id(scope, key)
+        if entry_id in self._entries:
+            scores = {entry_id: 1.0}
+        else:
+            scores: Dict[str, float] = {}
+            for term, weight in self.model.vector(key).items():
+                for entry_id, entry_weight in postings.get(term, {}).items():
+                    scores[entry_id] = scores.get(entry_id, 0.0) + weight * entry_weight
+        words = _content_words(key)
+        candidates = [(score, entry_id) for entry_id, score in scores.items() if score >= self.threshold]
+        for _, entry_id in sorted(candidates, reverse=True):
+            entry = self._entries[entry_id]
+            if _content_words(entry.key) != words:
+                continue  # Similar wording, different question (high/low, metformin/metoprolol, vitamin d/c)
+            if entry.created_at + self.ttl < time.time():
+                self._remove(entry_id)
+                continue
+            self._entries.move_to_end(entry_id)
+            return entry
+        return None
+
+    def _add(self, entry_id: str, scope: str, key: str, answer: str, created_at: float):
+        if entry_id in self._entries:
+            self._remove(entry_id)
+        entry = _Entry(scope, key, answer, self.model.vector(key), created_at)
+        self._entries[entry_id] = entry
+        postings = self._postings.setdefault(scope, {})
+        for term, weight in entry.vector.items():
+            postings.setdefault(term, {})[entry_id] = weight
+        while len(self._entries) > self.maxsize:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _remove(self, entry_id: str):
+        entry = self._entries.pop(entry_id)
+        postings = self._postings[entry.scope]
+        for term in entry.vector:
+            ids = postings.get(term)
+            if ids is not None:
+                ids.pop(entry_id, None)
+                if not ids:
+                    del postings[term]
+        if not postings:
+            del self._postings[entry.scope]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            **self.latency.summary("lookup_us"),
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "persistent": self.collection is not None,
+        }
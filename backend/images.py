@@ -0,0 +1,165 @@
+"""
+Image preprocessing for the vision endpoints
+"""
+import base64
+import binascii
+import hashlib
+import io
+import os
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Dict, Optional, Union
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Resizing is skipped when Pillow isn't installed
+    Image = None
+
+# Default (max edge in px, JPEG quality, max upload size in bytes) per endpoint.
+# Override with <NAME>_IMAGE_MAX_EDGE / <NAME>_IMAGE_QUALITY / <NAME>_IMAGE_MAX_BYTES.
+DEFAULT_IMAGE_PROFILES = {
+    "meal": (768, 80, 8 * 1024 * 1024),
+    # Prescriptions need enough resolution to keep handwriting legible
+    "prescription": (1600, 85, 12 * 1024 * 1024),
+}
+
+MAGIC_NUMBERS = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+)
+
+
+class ImageRejected(ValueError):
+    """The uploaded image can't be processed."""
+
+
+class ImageTooLarge(ImageRejected):
+    """The uploaded image exceeds the endpoint's size cap."""
+
+
+@dataclass
+class ImageProfile:
+    max_edge: int
+    quality: int
+    max_bytes: int
+
+
+@dataclass
+class PreparedImage:
+    data: Optional[bytes] = None
+    mime: Optional[str] = None
+    url: Optional[str] = None  # Remote images are passed through untouched
+
+    @cached_property
+    def digest(self) -> str:
+        return hashlib.sha256(self.data if self.data is not None else self.url.encode()).hexdigest()
+
+    def to_url(self) -> str:
+        """Builds the URL sent to Groq; this is the only place base64 is produced."""
+        if self.url:
+            return self.url
+        return f"data:{self.mime};base64,{base64.b64encode(self.data).decode('ascii')}"
+
+
+def load_image_profiles() -> Dict[str, ImageProfile]:
+    profiles = {}
+    for name, (max_edge, quality, max_bytes) in DEFAULT_IMAGE_PROFILES.items():
+        prefix = f"{name.upper()}_IMAGE"
+        profiles[name] = ImageProfile(
+            max_edge=int(os.getenv(f"{prefix}_MAX_EDGE", max_edge)),
+            quality=int(os.getenv(f"{prefix}_QUALITY", quality)),
+            max_bytes=int(os.getenv(f"{prefix}_MAX_BYTES", max_bytes)),
+        )
+    return profiles
+
+
+IMAGE_PROFILES = load_image_profiles()
+
+
+def sniff_mime(data: bytes) -> Optional[str]:
+    """Detects the image format from its magic bytes."""
+    for magic, mime in MAGIC_NUMBERS:
+        if data.startswith(magic):
+            return mime
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def decode_base64_image(image_data: str, max_bytes: int) -> bytes:
+    """Decodes a base64 string or data URL, refusing oversized payloads before decoding."""
+    if image_data.startswith("data:"):
+        image_data = image_data.partition(",")[2]
+    if len(image_data) * 3 // 4 > max_bytes:
+        raise ImageTooLarge(f"Image exceeds the {max_bytes // (1024 * 1024)} MB limit.")
+    try:
+        return base64.b64decode(image_data)
+    except (binascii.Error, ValueError):
+        raise ImageRejected("Image data is not valid base64.")
+
+
+def _downscale(data: bytes, profile: ImageProfile) -> Optional[bytes]:
+    """Returns a recompressed JPEG no larger than profile.max_edge, or None to keep the original."""
+    with Image.open(io.BytesIO(data)) as img:
+        # Lets the JPEG decoder scale down by DCT instead of decoding full size
+        img.draft("RGB", (profile.max_edge, profile.max_edge))
+        img = ImageOps.exif_transpose(img)
+        if img.mode in ("RGBA", "LA", "P"):
+            img = img.convert("RGBA")
+            background = Image.new("RGB", img.size, (255, 255, 255))
+            background.paste(img, mask=img.getchannel("A"))
+            img = background
+        elif img.mode != "RGB":
+            img = img.convert("RGB")
+        img.thumbnail((profile.max_edge, profile.max_edge))
+
+        out = io.BytesIO()
+        img.save(out, format="JPEG", quality=profile.quality, optimize=True)
+    result = out.getvalue()
+    return result if len(result) < len(data) else None
+
+
+async def read_upload(upload, endpoint: str, chunk_size: int = 64 * 1024) -> bytes:
+    """Reads a multipart upload (already spooled by the form parser) in chunks, enforcing the size cap."""
+    max_bytes = IMAGE_PROFILES[endpoint].max_bytes
+    if upload.size is not None and upload.size > max_bytes:
+        raise ImageTooLarge(f"Image exceeds the {max_bytes // (1024 * 1024)} MB limit.")
+    buffer = bytearray()
+    while True:
+        chunk = await upload.read(chunk_size)
+        if not chunk:
+            break
+        buffer += chunk
+        if len(buffer) > max_bytes:
+            raise ImageTooLarge(f"Image exceeds the {max_bytes // (1024 * 1024)} MB limit.")
+    return bytes(buffer)
+
+
+def prepare_image(image: Union[str, bytes, PreparedImage], endpoint: str) -> PreparedImage:
+    """Decodes once, validates the format and downscales to the endpoint's profile."""
+    if isinstance(image, PreparedImage):
+        return image  # Already prepared (background jobs prepare before queueing)
+    profile = IMAGE_PROFILES[endpoint]
+    if isinstance(image, str):
+        if image.startswith(("http://", "https://")):
+            return PreparedImage(url=image)
+        data = decode_base64_image(image, profile.max_bytes)
+    else:
+        data = bytes(image)
+        if len(data) > profile.max_bytes:
+            raise ImageTooLarge(f"Image exceeds the {profile.max_bytes // (1024 * 1024)} MB limit.")
+
+    mime = sniff_mime(data)
+    if mime is None:
+        raise ImageRejected("Unsupported image format. Please upload a JPEG, PNG, WEBP or GIF.")
+
+    if Image is not None:
+        try:
+            resized = _downscale(data, profile)
+        except Exception as e:
+            raise ImageRejected(f"Image could not be decoded: {e}")
+        if resized is not None:
+            return PreparedImage(data=resized, mime="image/jpeg")
+    return PreparedImage(data=data, mime=mime)
@@ -0,0 +1,325 @@
+"""
+Local intent classifier and template replies for the offline path and trivial messages
+"""
+import math
+import os
+import re
+import time
+import zlib
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from metrics import LatencyWindow
+from models import UserContext
+
+_WORD = re.compile(r"[a-z0-9']+")
+
+
+def normalize(text: str) -> str:
+    """Lowercases, unifies quotes and keeps only word characters, single-spaced."""
+    text = text.lower().replace("’", "'").replace("‘", "'")
+    return " ".join(_WORD.findall(text))
+
+
+def features(text: str) -> Counter:
+    """Word unigrams and bigrams plus character trigrams (which absorb typos like "stresed")."""
+    words = normalize(text).split()
+    feats = Counter(words)
+    feats.update(f"{a} {b}" for a, b in zip(words, words[1:]))
+    for word in words:
+        padded = f"<{word}>"
+        feats.update(f"#{padded[i:i + 3]}" for i in range(len(padded) - 2))
+    return feats
+
+
+def cosine(a: Dict[str, float], b: Dict[str, float]) -> float:
+    """Dot product of two L2-normalized sparse vectors."""
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(weight * b.get(term, 0.0) for term, weight in a.items())
+
+
+class TfidfModel:
+    """Sparse, L2-normalized TF-IDF vectors with the IDF fitted once on a fixed corpus.
+
+    Terms the corpus never saw get the highest IDF, so unfamiliar wording lowers
+    the similarity instead of being ignored.
+    """
+
+    def __init__(self, documents: List[str]):
+        df = Counter()
+        for doc in documents:
+            df.update(set(features(doc)))
+        n = len(documents)
+        self.idf = {term: math.log((1 + n) / (1 + count)) + 1 for term, count in df.items()}
+        self.default_idf = math.log(1 + n) + 1
+
+    def vector(self, text: str) -> Dict[str, float]:
+        vec = {
+            term: (1 + math.log(count)) * self.idf.get(term, self.default_idf)
+            for term, count in features(text).items()
+        }
+        norm = math.sqrt(sum(v * v for v in vec.values()))
+        return {term: v / norm for term, v in vec.items()} if norm else {}
+
+
+@dataclass
+class Intent:
+    name: str
+    examples: List[str]
+    replies: List[str]
+    trivial: bool = False  # Safe to answer without the LLM when it's the whole message
+
+
+# Replies are str.format templates over the slots built in IntentEngine._slots.
+INTENTS = [
+    Intent("greeting", trivial=True, examples=[
+        "hi", "hello", "hey", "hey there", "hi there", "hello aromi", "hi aromi", "hey aromi",
+        "good morning", "good afternoon", "good evening", "morning", "namaste", "yo", "hiya",
+        "hello how are you", "hi how are you", "how are you doing", "what's up", "whats up", "sup",
+    ], replies=[
+        "Hello {name}! I'm AroMi. I'm focusing on your {goal} goal today. How are you feeling right now?",
+        "Hi {name}! Good to see you. With your energy at {energy}/10, what would help you most today?",
+    ]),
+    Intent("thanks", trivial=True, examples=[
+        "thanks", "thank you", "thank you so much", "thanks a lot", "thx", "ty", "thank u",
+        "appreciate it", "i appreciate it", "that helps", "that helped", "great thanks",
+        "awesome thank you", "thanks aromi", "perfect thanks", "cool thanks",
+    ], replies=[
+        "Anytime, {name}! Small steps add up. I'm here whenever you need me.",
+        "You're welcome, {name}! Keep going with your {goal} goal. You're doing great.",
+    ]),
+    Intent("goodbye", trivial=True, examples=[
+        "bye", "goodbye", "bye bye", "see you", "see you later", "see you tomorrow", "talk later",
+        "talk to you later", "good night", "gn", "catch you later", "i'm done for today",
+    ], replies=[
+        "Take care, {name}! Remember to drink some water and rest well. See you soon.",
+        "Goodbye {name}! Proud of the effort you're putting into your {goal} goal.",
+    ]),
+    Intent("stress", examples=[
+        "i'm stressed", "i am so stressed", "feeling stressed", "i feel anxious", "anxiety",
+        "i'm overwhelmed", "work is stressing me out", "i'm panicking", "i can't relax",
+        "feeling tense and worried", "too much pressure", "i'm nervous about exams", "calm down",
+    ], replies=[
+        "I hear you, {name}. Since you're feeling stressed (Energy: {energy}/10), let's take a deep breath together. Try box breathing: in for 4, hold 4, out for 4, hold 4, repeated four times.",
+        "That sounds like a lot, {name}. Step away for two minutes, relax your shoulders and take five slow breaths with a longer exhale. Want to try a quick grounding exercise?",
+    ]),
+    Intent("low_mood", examples=[
+        "i feel sad", "feeling down", "i'm depressed", "i feel lonely", "i'm not happy",
+        "i feel low today", "everything feels bad", "i'm upset", "bad day", "i feel empty",
+    ], replies=[
+        "I'm sorry you're feeling this way, {name}. A 10-minute walk outside and a message to someone you trust can lift your mood more than you'd expect. If this feeling lasts, please talk to a professional {location_hint}.",
+    ]),
+    Intent("sleep", examples=[
+        "i can't sleep", "insomnia", "how to sleep better", "i keep waking up at night",
+        "trouble falling asleep", "sleep schedule", "how many hours should i sleep",
+        "i slept badly", "poor sleep quality", "sleep tips",
+    ], replies=[
+        "Good sleep starts before bed, {name}: no screens 30 minutes before, a cool dark room and the same wake-up time every day. Aim for 7-9 hours and skip caffeine after 2 PM.",
+    ]),
+    Intent("low_energy", examples=[
+        "i'm tired", "i feel tired", "no energy", "i'm exhausted", "feeling sluggish", "fatigue",
+        "i feel drained", "so sleepy during the day", "low energy today", "burnt out",
+    ], replies=[
+        "With your energy at {energy}/10, {name}, go gentle: drink a glass of water, get some daylight and try {workout_hint}. A protein-rich snack can help too.",
+    ]),
+    Intent("workout", examples=[
+        "workout", "give me a workout", "exercise plan", "what exercise should i do", "gym routine",
+        "fitness", "fitness routine", "how to build muscle", "cardio", "running plan", "home workout",
+        "strength training", "how many steps should i walk", "yoga",
+    ], replies=[
+        "For your {goal} goal, I recommend {workout_hint} today. Your current step count of {steps} is a great start!",
+        "Let's keep you moving, {name}: {workout_hint}, then a 5-minute stretch. You're at {steps} steps so far.",
+    ]),
+    Intent("diet", examples=[
+        "what should i eat", "diet", "diet plan", "food", "healthy meal ideas", "what to eat for breakfast",
+        "healthy snacks", "how much protein do i need", "calories", "dinner ideas", "is this food healthy",
+        "meal plan", "lunch suggestions",
+    ], replies=[
+        "With a {diet} diet, focus on whole foods: half a plate of vegetables, a palm of protein and some whole grains. Since your energy is {energy}/10, try something light but sustaining.",
+    ]),
+    Intent("hydration", examples=[
+        "how much water should i drink", "daily water intake", "hydration", "i'm thirsty",
+        "drink more water", "am i dehydrated", "water",
+    ], replies=[
+        "Aim for about 2-3 litres of water a day, {name}, more if you're active or it's hot. Start now with a 250ml glass and keep a bottle within reach.",
+    ]),
+    Intent("weight", examples=[
+        "lose weight", "weight loss", "how to lose belly fat", "burn fat", "i want to gain weight",
+        "how to lose weight fast", "i gained weight", "weight management",
+    ], replies=[
+        "For steady weight change, {name}, combine a small calorie adjustment with {workout_hint} most days and protein at every meal. Consistency beats crash diets.",
+    ]),
+    Intent("symptom", examples=[
+        "i have a headache", "chest pain", "my back hurts", "i have a fever", "i feel dizzy",
+        "i'm injured", "my knee hurts", "stomach ache", "i feel sick", "pain", "i have a cold",
+        "knee pain", "back pain", "joint pain", "what should i do about this pain", "my throat is sore",
+    ], replies=[
+        "I'm sorry you're not feeling well, {name}. Rest, hydrate and avoid strenuous activity for now. I'm an AI, not a doctor: if it's severe or persists, please see a physician {location_hint}.",
+    ]),
+    Intent("motivation", examples=[
+        "i need motivation", "i keep skipping workouts", "i can't stay consistent", "i feel lazy",
+        "how do i stay motivated", "i gave up", "i don't feel like doing anything", "help me stay on track",
+    ], replies=[
+        "Motivation follows action, {name}. Pick one tiny step for your {goal} goal, like 5 minutes of movement, and do it now. Tick it off and build from there.",
+    ]),
+]
+
+# Words that may pad a trivial message ("thanks again aromi") without changing its meaning
+FILLER_WORDS = frozenset("aromi ok okay again very really too please".split())
+
+# Any word starting with one of these sends the message to the LLM, however greeting-like it is
+VETO_PREFIXES = (
+    "breath", "suicid", "kill", "die", "dying", "dead", "death", "hurt", "harm", "pain", "chest",
+    "bleed", "blood", "faint", "emergenc", "overdos", "help", "sick", "dizz", "attack", "seizure",
+    "unconscious", "collaps", "numb", "choke", "chok", "vomit", "poison", "cut", "done",
+)
+
+DEFAULT_REPLY = "Hello {name}! I'm AroMi. I'm focusing on your {goal} today. How can I support your journey specifically right now?"
+
+
+class IntentEngine:
+    """Nearest-example TF-IDF classifier over the curated INTENTS corpus.
+
+    Built once at startup. Classifying walks an inverted index of the example
+    vectors, so a message costs well under a millisecond. Replies are filled
+    from the UserContext, so the offline path stays personal.
+    """
+
+    def __init__(self, intents: List[Intent], min_score: float = 0.3, preroute: bool = True,
+                 preroute_min_score: float = 0.6, preroute_max_words: int = 6):
+        self.intents = {intent.name: intent for intent in intents}
+        self.min_score = min_score
+        self.preroute = preroute
+        self.preroute_min_score = preroute_min_score
+        self.preroute_max_words = preroute_max_words
+
+        examples = [(intent.name, example) for intent in intents for example in intent.examples]
+        self.model = TfidfModel([example for _, example in examples])
+        self._labels = [name for name, _ in examples]
+        self._index: Dict[str, List[Tuple[int, float]]] = {}
+        for i, (_, example) in enumerate(examples):
+            for term, weight in self.model.vector(example).items():
+                self._index.setdefault(term, []).append((i, weight))
+
+        # Pre-routing needs every word of the message to be specific to the intent: used in its
+        # examples and no other intent's ("good", "i'm", "you" are shared, so "good" alone isn't a goodbye)
+        words_by_intent = {
+            intent.name: {word for example in intent.examples for word in normalize(example).split()}
+            for intent in intents
+        }
+        owners = Counter(word for words in words_by_intent.values() for word in words)
+        self._vocab = {
+            intent.name: {word for word in words_by_intent[intent.name]
+                          if owners[word] == 1 and not word.startswith(VETO_PREFIXES)} | FILLER_WORDS
+            for intent in intents if intent.trivial
+        }
+        self._trivial_examples = {
+            normalize(example): intent.name for intent in intents if intent.trivial for example in intent.examples
+        }
+
+        self.latency = LatencyWindow()
+        self.counts = Counter()
+        self.prerouted = 0
+        self.vetoed = 0
+        self.offline_replies = 0
+
+    @classmethod
+    def from_env(cls) -> "IntentEngine":
+        return cls(
+            INTENTS,
+            min_score=float(os.getenv("INTENT_MIN_SCORE", 0.3)),
+            preroute=os.getenv("INTENT_PREROUTE_ENABLED", "1") == "1",
+            preroute_min_score=float(os.getenv("INTENT_PREROUTE_MIN_SCORE", 0.6)),
+            preroute_max_words=int(os.getenv("INTENT_PREROUTE_MAX_WORDS", 6)),
+        )
+
+    def classify(self, message: str) -> Tuple[Optional[str], float]:
+        """Returns (intent, score) of the closest example, or (None, score) below min_score."""
+        started = time.perf_counter()
+        scores: Dict[int, float] = {}
+        for term, weight in self.model.vector(message).items():
+            for i, example_weight in self._index.get(term, ()):
+                scores[i] = scores.get(i, 0.0) + weight * example_weight
+        best, score = None, 0.0
+        if scores:
+            i = max(scores, key=scores.get)
+            best, score = self._labels[i], scores[i]
+        self.latency.record((time.perf_counter() - started) * 1e6)
+
+        if score < self.min_score:
+            best = None
+        self.counts[best or "unknown"] += 1
+        return best, score
+
+    def quick_reply(self, message: str, context: UserContext) -> Optional[str]:
+        """Answers greetings/thanks/goodbyes locally, or returns None to go to the LLM.
+
+        Only messages that are an example verbatim, or made up entirely of the trivial
+        intent's specific words, qualify; symptom/crisis words (and "done") always go to the LLM.
+        """
+        words = normalize(message).split()
+        if not self.preroute or not words or len(words) > self.preroute_max_words:
+            return None
+        if any(word.startswith(VETO_PREFIXES) for word in words):
+            self.vetoed += 1
+            return None
+        name = self._trivial_examples.get(" ".join(words))
+        if name is None:
+            name, score = self.classify(message)
+            if name not in self._vocab or score < self.preroute_min_score:
+                return None
+            if not set(words) <= self._vocab[name]:
+                return None
+        self.prerouted += 1
+        return self._render(name, message, context)
+
+    def reply(self, message: str, context: UserContext) -> str:
+        """Offline answer: the classified intent, else one inferred from mood/energy."""
+        name, _ = self.classify(message)
+        if name is None:
+            if context.mood == "stressed":
+                name = "stress"
+            elif (context.energy_level or 5) <= 3:
+                name = "low_energy"
+        self.offline_replies += 1
+        return self._render(name, message, context)
+
+    def _render(self, name: Optional[str], message: str, context: UserContext) -> str:
+        if name is None:
+            template = DEFAULT_REPLY
+        else:
+            replies = self.intents[name].replies
+            # Stable per message, so retries don't flip between variants
+            template = replies[zlib.crc32(normalize(message).encode()) % len(replies)]
+        return template.format(**self._slots(context))
+
+    def _slots(self, context: UserContext) -> Dict[str, str]:
+        energy = context.energy_level if context.energy_level is not None else 5
+        if energy > 7:
+            workout = "a 20-minute cardio blast (jumping jacks, high knees)"
+        elif energy >= 4:
+            workout = "a brisk 30-minute walk"
+        else:
+            workout = "a 10-minute low-impact stretching routine"
+        diet = (context.lifestyle_inputs or {}).get("diet_type")
+        return {
+            "name": context.name or "there",
+            "goal": context.health_goals[0] if context.health_goals else "wellness",
+            "energy": energy,
+            "steps": context.steps or 0,
+            "diet": diet if diet and diet != "None" else "balanced",
+            "workout_hint": workout,
+            "location_hint": f"near {context.location}" if context.location else "nearby",
+        }
+
+    def stats(self) -> dict:
+        return {
+            "classified": self.latency.count,
+            **self.latency.summary("classify_us"),
+            "prerouted": self.prerouted,
+            "preroute_vetoed": self.vetoed,
+            "offline_replies": self.offline_replies,
+            "intents": dict(self.counts),
+        }
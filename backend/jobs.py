@@ -0,0 +1,157 @@
+"""
+Background job queue for long-running vision analyses
+"""
+import asyncio
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, Optional
+
+from cache import TTLCache
+from metrics import LatencyWindow
+
+
+class QueueFull(Exception):
+    """Raised when the job queue is at capacity (backpressure)."""
+
+
+class JobQueue:
+    """Bounded asyncio queue drained by a fixed pool of workers.
+
+    Job state is kept in memory for the submitting worker and mirrored to a MongoDB
+    collection, so results can be polled from any uvicorn worker after completion.
+    """
+
+    def __init__(self, handlers: Dict[str, Callable[..., Awaitable[str]]], workers: int, maxsize: int, result_ttl: float):
+        self.handlers = handlers
+        self.worker_count = workers
+        self.result_ttl = result_ttl
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self._jobs = TTLCache(maxsize=max(2 * maxsize, 1024), ttl=result_ttl)
+        self._events: Dict[str, asyncio.Event] = {}
+        self._workers = []
+        self.collection = None
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.wait_times = LatencyWindow()
+        self.run_times = LatencyWindow()
+
+    async def start(self, collection=None):
+        self.collection = collection
+        if collection is not None:
+            await collection.create_index("expires_at", expireAfterSeconds=0)
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.worker_count)]
+
+    async def stop(self):
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def submit(self, kind: str, user_id: str, *args) -> dict:
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "kind": kind,
+            "user_id": user_id,
+            "status": "queued",
+            "result": None,
+            "error": None,
+            "submitted_at": datetime.now(timezone.utc).isoformat(),
+            "finished_at": None,
+        }
+        try:
+            self._queue.put_nowait((job["job_id"], time.monotonic(), args))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise QueueFull("Analysis queue is full. Please retry shortly.")
+        self._jobs.set(job["job_id"], job)
+        self._events[job["job_id"]] = asyncio.Event()
+        await self._persist(job)
+        return job
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return dict(job)
+        if self.collection is not None:
+            return await self.collection.find_one({"_id": job_id}, {"_id": 0, "expires_at": 0})
+        return None
+
+    async def wait(self, job_id: str, timeout: float) -> None:
+        """Waits until the job changes state locally, or `timeout` elapses."""
+        event = self._events.get(job_id)
+        if event is None:
+            await asyncio.sleep(timeout)
+            return
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _worker(self):
+        while True:
+            job_id, enqueued_at, args = await self._queue.get()
+            job = self._jobs.get(job_id)
+            try:
+                if job is None:
+                    continue
+                self.wait_times.record(time.monotonic() - enqueued_at)
+                self.running += 1
+                job["status"] = "running"
+                await self._persist(job)
+                self._notify(job_id)
+
+                started = time.monotonic()
+                try:
+                    job["result"] = await self.handlers[job["kind"]](*args)
+                    job["status"] = "completed"
+                    self.completed += 1
+                except Exception as e:
+                    job["error"] = str(e)
+                    job["status"] = "failed"
+                    self.failed += 1
+                finally:
+                    self.running -= 1
+                    self.run_times.record(time.monotonic() - started)
+                job["finished_at"] = datetime.now(timezone.utc).isoformat()
+                await self._persist(job)
+                self._notify(job_id, final=True)
+            finally:
+                self._queue.task_done()
+
+    def _notify(self, job_id: str, final: bool = False):
+        event = self._events.pop(job_id, None) if final else self._events.get(job_id)
+        if event is not None:
+            event.set()
+            if not final:
+                self._events[job_id] = asyncio.Event()
+
+    async def _persist(self, job: dict):
+        if self.collection is None:
+            return
+        try:
+            expires_at = datetime.now(timezone.utc) + timedelta(seconds=self.result_ttl)
+            await self.collection.update_one(
+                {"_id": job["job_id"]},
+                {"$set": {**job, "expires_at": expires_at}},
+                upsert=True
+            )
+        except Exception as e:
+            print(f"Job persistence error: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self._queue.qsize(),
+            "queue_capacity": self._queue.maxsize,
+            "workers": len(self._workers),
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            **self.wait_times.summary("wait_seconds"),
+            **self.run_times.summary("run_seconds"),
+        }
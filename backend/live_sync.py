@@ -0,0 +1,177 @@
+"""
+Live vitals/context sync over WebSockets
+"""
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+from fastapi import WebSocket
+
+from models import MetricSample, UserContext
+
+# Delta frame fields -> where they live in the users document
+LIVE_FIELDS = {
+    "heart_rate": ("vitals", "heart_rate"),
+    "steps": ("steps",),
+    "energy_level": ("energy_level",),
+    "calories_burned": ("calories_burned",),
+}
+
+# Accepted values per field: (type, min, max), matching the UserContext field types
+FIELD_LIMITS = {
+    "heart_rate": (float, 20, 250),
+    "steps": (int, 0, 200000),
+    "energy_level": (int, 1, 10),
+    "calories_burned": (float, 0, 20000),
+}
+
+
+class FrameError(ValueError):
+    """The client sent a frame the hub can't apply."""
+
+
+def _check_value(field: str, value):
+    kind, low, high = FIELD_LIMITS[field]
+    if not isinstance(value, (int, float)) or isinstance(value, bool):
+        raise FrameError(f"{field} must be a number")
+    if kind is int:
+        if isinstance(value, float) and not value.is_integer():
+            raise FrameError(f"{field} must be a whole number")
+        value = int(value)
+    if not low <= value <= high:
+        raise FrameError(f"{field} must be between {low} and {high}")
+    return value
+
+
+class LiveSyncHub:
+    """Tracks connected clients and coalesces their delta frames before persisting.
+
+    Every connection only costs its receive loop; a single background task writes the
+    latest value per user and field once per `flush_interval`, however many frames
+    arrived in between.
+    """
+
+    def __init__(self, profile_store, metric_series, flush_interval: float, recommendation_interval: float,
+                 recommend: Callable[[UserContext], Awaitable]):
+        self.profile_store = profile_store
+        self.metric_series = metric_series
+        self.flush_interval = flush_interval
+        self.recommendation_interval = recommendation_interval
+        self.recommend = recommend
+        self._connections: Dict[str, Set[WebSocket]] = {}
+        self._pending: Dict[str, dict] = {}
+        self._last_recommendation: Dict[str, float] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.frames = 0
+        self.flushes = 0
+        self.persisted_users = 0
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    def connect(self, user_id: str, websocket: WebSocket):
+        self._connections.setdefault(user_id, set()).add(websocket)
+
+    def disconnect(self, user_id: str, websocket: WebSocket):
+        sockets = self._connections.get(user_id)
+        if sockets is not None:
+            sockets.discard(websocket)
+            if not sockets:
+                del self._connections[user_id]
+                self._last_recommendation.pop(user_id, None)
+
+    def apply(self, user_id: str, frame: dict) -> dict:
+        """Validates a delta frame and merges it into the user's pending values."""
+        delta = {}
+        for field, value in frame.items():
+            if field == "type":
+                continue
+            if field not in LIVE_FIELDS:
+                raise FrameError(f"Unsupported field: {field}")
+            delta[field] = _check_value(field, value)
+        if delta:
+            self.frames += 1
+            self._pending.setdefault(user_id, {}).update(delta)
+        return delta
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Live sync flush error: {e}")
+
+    async def flush(self):
+        pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        self.flushes += 1
+        await asyncio.gather(*(self._persist(user_id, delta) for user_id, delta in pending.items()))
+
+    async def _persist(self, user_id: str, delta: dict):
+        changes = {}
+        for field, value in delta.items():
+            path = LIVE_FIELDS[field]
+            if len(path) == 2:
+                changes.setdefault(path[0], {})[path[1]] = value
+            else:
+                changes[path[0]] = value
+        try:
+            await self.profile_store.patch(user_id, changes)
+            await self.metric_series.ingest(
+                user_id, [MetricSample(metric=field, value=value) for field, value in delta.items()]
+            )
+            self.persisted_users += 1
+        except Exception as e:
+            print(f"Live sync persist error for {user_id}: {e}")
+
+    async def current_context(self, user_id: str) -> Optional[UserContext]:
+        """Stored profile with the not-yet-flushed deltas applied."""
+        profile = await self.profile_store.get(user_id)
+        if profile is None:
+            return None
+        for field, value in self._pending.get(user_id, {}).items():
+            path = LIVE_FIELDS[field]
+            if len(path) == 2:
+                profile.setdefault(path[0], {})[path[1]] = value
+            else:
+                profile[path[0]] = value
+        return UserContext(**profile)
+
+    async def maybe_recommend(self, user_id: str, force: bool = False):
+        """Pushes a proactive recommendation, at most once per recommendation_interval."""
+        now = time.monotonic()
+        last = self._last_recommendation.get(user_id)
+        if not force and last is not None and now - last < self.recommendation_interval:
+            return
+        self._last_recommendation[user_id] = now
+        context = await self.current_context(user_id)
+        if context is None:
+            return
+        recommendation = await self.recommend(context)
+        await self.send(user_id, {"type": "recommendation", "data": recommendation.model_dump()})
+
+    async def send(self, user_id: str, message: dict):
+        for websocket in list(self._connections.get(user_id, ())):
+            try:
+                await websocket.send_json(message)
+            except Exception:
+                self.disconnect(user_id, websocket)
+
+    def stats(self) -> dict:
+        return {
+            "connected_users": len(self._connections),
+            "connections": sum(len(s) for s in self._connections.values()),
+            "pending_users": len(self._pending),
+            "frames": self.frames,
+            "flushes": self.flushes,
+            "persisted_users": self.persisted_users,
+        }
@@ -0,0 +1,242 @@
+"""
+Async Groq client with a shared keep-alive connection pool
+"""
+import asyncio
+import json
+import os
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, List, Optional
+
+import httpx
+
+from resilience import RETRYABLE_STATUS, CircuitBreaker, CircuitOpenError, RetryPolicy, UpstreamError
+from tracing import record_tokens, span
+
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL", "https://api.groq.com/openai/v1")
+
+# Default (concurrency, timeout in seconds) per endpoint class.
+# Override with GROQ_<NAME>_CONCURRENCY / GROQ_<NAME>_TIMEOUT.
+DEFAULT_ENDPOINT_LIMITS = {
+    "text": (200, 20.0),
+    "meal": (32, 30.0),
+    "prescription": (16, 60.0),
+}
+
+
+class GroqError(UpstreamError):
+    """Raised when the Groq API answers with a non-200 status."""
+
+    def __init__(self, status_code: int, detail: str, retry_after: Optional[str] = None):
+        super().__init__(f"Groq API Error ({status_code}): {detail}")
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+    @property
+    def failed_generation(self) -> Optional[str]:
+        """The rejected output of a JSON-mode call (400 json_validate_failed), if that's what this is."""
+        if self.status_code != 400:
+            return None
+        try:
+            error = json.loads(self.detail).get("error") or {}
+        except (ValueError, AttributeError):
+            return None
+        if error.get("code") != "json_validate_failed":
+            return None
+        return error.get("failed_generation") or ""
+
+
+class GroqConnectionError(UpstreamError):
+    """Raised when Groq can't be reached or doesn't answer in time."""
+
+
+@dataclass
+class EndpointLimits:
+    concurrency: int
+    timeout: float
+
+
+@dataclass
+class Completion:
+    text: str
+    model: str
+    usage: Dict[str, int] = field(default_factory=dict)
+
+
+def load_endpoint_limits() -> Dict[str, EndpointLimits]:
+    """Reads per-endpoint concurrency and timeout settings from the environment."""
+    limits = {}
+    for name, (concurrency, timeout) in DEFAULT_ENDPOINT_LIMITS.items():
+        prefix = f"GROQ_{name.upper()}"
+        limits[name] = EndpointLimits(
+            concurrency=int(os.getenv(f"{prefix}_CONCURRENCY", concurrency)),
+            timeout=float(os.getenv(f"{prefix}_TIMEOUT", timeout)),
+        )
+    return limits
+
+
+class GroqClient:
+    """Shares one pooled httpx.AsyncClient across every Groq call of the process."""
+
+    def __init__(self, api_key: str, base_url: str = GROQ_BASE_URL, limits: Optional[Dict[str, EndpointLimits]] = None):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.limits = limits or load_endpoint_limits()
+        self._semaphores = {name: asyncio.Semaphore(l.concurrency) for name, l in self.limits.items()}
+        self._pool_limits = httpx.Limits(
+            max_connections=int(os.getenv("GROQ_MAX_CONNECTIONS", 256)),
+            max_keepalive_connections=int(os.getenv("GROQ_MAX_KEEPALIVE", 64)),
+            keepalive_expiry=float(os.getenv("GROQ_KEEPALIVE_EXPIRY", 30)),
+        )
+        self._client: Optional[httpx.AsyncClient] = None
+        self.retry = RetryPolicy.from_env()
+        self.breakers = {name: CircuitBreaker.from_env(f"groq:{name}") for name in self.limits}
+        self.retries = 0
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # Created lazily so the pool is bound to the running event loop
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={
+                    'Content-Type': 'application/json',
+                    'Authorization': f'Bearer {self.api_key}'
+                },
+                limits=self._pool_limits,
+            )
+        return self._client
+
+    def _after_failure(self, endpoint: str, error: UpstreamError, attempt: int) -> Optional[float]:
+        """Updates the breaker and returns the backoff before the next attempt, or None to give up."""
+        status = getattr(error, "status_code", None)
+        if status is not None and status not in RETRYABLE_STATUS:
+            # The service answered (e.g. 400/401): not an availability problem
+            self.breakers[endpoint].record_success()
+            return None
+        self.breakers[endpoint].record_failure()
+        delay = self.retry.delay(attempt, getattr(error, "retry_after", None))
+        if delay is not None:
+            self.retries += 1
+        return delay
+
+    async def _chat_once(self, endpoint: str, data: dict) -> dict:
+        semaphore = self._semaphores[endpoint]
+        with span("groq_queue"):
+            await semaphore.acquire()
+        try:
+            with span("groq_upstream"):
+                response = await self._get_client().post("/chat/completions", json=data, timeout=self.limits[endpoint].timeout)
+        except httpx.TransportError as e:
+            raise GroqConnectionError(f"{type(e).__name__}: {e}")
+        finally:
+            semaphore.release()
+        if response.status_code != 200:
+            raise GroqError(response.status_code, response.text, response.headers.get("retry-after"))
+        try:
+            return response.json()
+        except ValueError:
+            # e.g. an HTML page from a proxy in front of the API
+            raise GroqError(502, f"Invalid JSON body: {response.text[:200]}")
+
+    async def chat(self, messages: List[dict], model: str, endpoint: str = "text", **params) -> Completion:
+        """Runs a chat completion under the concurrency limit, timeout, retry policy and breaker of `endpoint`."""
+        data = {"model": model, "messages": messages, **params}
+        breaker = self.breakers[endpoint]
+        attempt = 0
+        while True:
+            attempt += 1
+            if not breaker.allow():
+                raise CircuitOpenError(f"Groq '{endpoint}' circuit is open")
+            try:
+                result = await self._chat_once(endpoint, data)
+            except UpstreamError as e:
+                delay = self._after_failure(endpoint, e, attempt)
+                if delay is None:
+                    raise
+                with span("groq_backoff"):
+                    await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                # Cancelled (client went away) or a local error: no verdict on Groq's health
+                breaker.release()
+                raise
+            breaker.record_success()
+            text = result['choices'][0]['message']['content'] if result.get('choices') else ""
+            usage = result.get("usage") or {}
+            record_tokens(usage)
+            return Completion(text=text or "", model=result.get("model", model), usage=usage)
+
+    async def stream_chat(self, messages: List[dict], model: str, endpoint: str = "text", **params) -> AsyncIterator[str]:
+        """Yields content deltas as Groq emits them (OpenAI-style SSE stream).
+
+        Retries only happen before the first token; a stream that breaks midway just raises.
+        """
+        limits = self.limits[endpoint]
+        data = {"model": model, "messages": messages, "stream": True, **params}
+        breaker = self.breakers[endpoint]
+        attempt = 0
+        while True:
+            attempt += 1
+            if not breaker.allow():
+                raise CircuitOpenError(f"Groq '{endpoint}' circuit is open")
+            started = False
+            semaphore = self._semaphores[endpoint]
+            with span("groq_queue"):
+                await semaphore.acquire()
+            try:
+                with span("groq_upstream"):
+                    async with self._get_client().stream("POST", "/chat/completions", json=data, timeout=limits.timeout) as response:
+                        if response.status_code != 200:
+                            detail = (await response.aread()).decode(errors="replace")
+                            raise GroqError(response.status_code, detail, response.headers.get("retry-after"))
+                        breaker.record_success()
+                        started = True
+
+                        async for line in response.aiter_lines():
+                            if not line.startswith("data:"):
+                                continue
+                            payload = line[len("data:"):].strip()
+                            if payload == "[DONE]":
+                                break
+                            try:
+                                chunk = json.loads(payload)
+                            except ValueError:
+                                raise GroqError(502, f"Invalid stream chunk: {payload[:200]}")
+                            # Groq reports usage on the last chunk under x_groq
+                            usage = chunk.get("usage") or (chunk.get("x_groq") or {}).get("usage")
+                            if usage:
+                                record_tokens(usage)
+                            choices = chunk.get("choices") or []
+                            delta = choices[0].get("delta", {}).get("content") if choices else None
+                            if delta:
+                                yield delta
+                return
+            except httpx.TransportError as e:
+                error = GroqConnectionError(f"{type(e).__name__}: {e}")
+            except GroqError as e:
+                error = e
+            except BaseException:
+                if not started:
+                    breaker.release()
+                raise
+            finally:
+                semaphore.release()
+            if started:
+                breaker.record_failure()
+                raise error
+            delay = self._after_failure(endpoint, error, attempt)
+            if delay is None:
+                raise error
+            with span("groq_backoff"):
+                await asyncio.sleep(delay)
+
+    def stats(self) -> dict:
+        return {
+            "retries": self.retries,
+            "breakers": {name: breaker.stats() for name, breaker in self.breakers.items()},
+        }
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
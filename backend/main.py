@@ -1,9 +1,30 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from contextlib import asynccontextmanager
-from models import ChatRequest, UserContext, ChatMessage, Recommendation, DoubtRequest, MealAnalysisRequest, PrescriptionAnalysisRequest
+import asyncio
+import json
+import os
+from datetime import datetime, timezone
+from pydantic import ValidationError
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+from starlette.datastructures import UploadFile
+from models import ChatRequest, UserContext, UserContextPatch, ChatMessage, Recommendation, DoubtRequest, MealAnalysisRequest, PrescriptionAnalysisRequest, ImageUploadRequest, MetricIngestRequest
 from agent import AroMiAgent
 from db import Database, get_database
+from images import IMAGE_PROFILES, ImageRejected, ImageTooLarge, prepare_image, read_upload
+from jobs import JobQueue, QueueFull
+from write_behind import WriteBehindBuffer
+from profiles import ProfileStore
+from timeseries import METRICS, MetricSeriesStore
+from live_sync import FrameError, LiveSyncHub
+from conversation import ConversationMemory
+from ratelimit import RateLimiter, RateLimitMiddleware, load_budgets
+from tracing import TracingRoute, registry as trace_registry, render_stats, span
+from profiler import SamplingProfiler
+from precompute import PrecomputeScheduler
+from typing import Optional
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -13,13 +34,53 @@ load_dotenv()
 async def lifespan(app: FastAPI):
     # Startup
     await Database.connect_db()
+    profile_store.attach(get_database().get_collection("users"))
+    if os.getenv("PROFILE_CACHE_CHANGE_STREAM", "").lower() in ("1", "true", "yes"):
+        await profile_store.start_change_stream()
+    if os.getenv("LLM_CACHE_SHARED", "").lower() in ("1", "true", "yes"):
+        # Share recommendation/plan cache hits across uvicorn workers
+        await agent.response_cache.attach_shared(get_database().get_collection("llm_cache"))
+    # Vision analyses are persisted so re-uploads of the same image cost no tokens
+    await agent.vision_cache.attach_shared(
+        get_database().get_collection("vision_cache"),
+        max_entries=int(os.getenv("VISION_CACHE_MAX_ENTRIES", 10000)),
+    )
+    if agent.doubt_cache is not None:
+        await agent.doubt_cache.attach(get_database().get_collection("doubt_cache"))
     # Data is now persistent. If you need to reset, do it manually or via a reset endpoint.
+    await analysis_jobs.start(get_database().get_collection("analysis_jobs"))
+    await chat_history_buffer.start(get_database().get_collection("chat_history"))
+    await conversation_memory.attach(
+        get_database().get_collection("chat_history"),
+        get_database().get_collection("conversation_summaries"),
+        retention_days=int(os.getenv("CHAT_HISTORY_RETENTION_DAYS", 0)),
+    )
+    await metric_series.setup(get_database())
+    await live_sync.start()
+    if precompute is not None:
+        await precompute.start(get_database())
+    if profiler is not None:
+        profiler.start()
     print("✓ Backend Biological Substrate Online")
     yield
     # Shutdown
+    if profiler is not None:
+        profiler.stop()
+    if precompute is not None:
+        await precompute.stop()
+    await live_sync.stop()
+    await analysis_jobs.stop()
+    await chat_history_buffer.stop()
+    await profile_store.stop()
+    await agent.aclose()
     Database.close_db()
 
 app = FastAPI(title="AroMi AI Agent API", lifespan=lifespan)
+# Phase timings per request (Server-Timing header, /metrics)
+app.router.route_class = TracingRoute
+
+# Opt-in (PROFILER_ENABLED=1); collapsed stacks are served at /debug/profile
+profiler = SamplingProfiler.from_env()
 
 # Collections will be initialized after database connection
 users_collection = None
@@ -37,6 +98,11 @@ def get_collections():
         wellness_plans_collection = db.get_collection("wellness_plans")
     return users_collection, chat_history_collection, recommendations_collection, wellness_plans_collection
 
+# Admission control for the Groq-backed endpoints (added before CORS so 429s carry CORS headers)
+rate_limiter = RateLimiter(load_budgets(), max_wait=float(os.getenv("RATE_LIMIT_MAX_WAIT", 2.0)))
+if os.getenv("RATE_LIMIT_ENABLED", "1").lower() in ("1", "true", "yes"):
+    app.add_middleware(RateLimitMiddleware, limiter=rate_limiter)
+
 # Setup CORS
 app.add_middleware(
     CORSMiddleware,
@@ -48,6 +114,55 @@ app.add_middleware(
 
 agent = AroMiAgent()
 
+# Submit-and-poll mode for the vision endpoints
+analysis_jobs = JobQueue(
+    {"meal": agent.analyze_meal, "prescription": agent.analyze_prescription},
+    workers=int(os.getenv("ANALYSIS_WORKERS", 8)),
+    maxsize=int(os.getenv("ANALYSIS_QUEUE_SIZE", 200)),
+    result_ttl=float(os.getenv("ANALYSIS_RESULT_TTL", 24 * 3600)),
+)
+
+# Read-through profile cache; writes are diffed against the cached copy
+profile_store = ProfileStore(
+    maxsize=int(os.getenv("PROFILE_CACHE_MAX_ENTRIES", 10000)),
+    ttl=float(os.getenv("PROFILE_CACHE_TTL", 60)),
+)
+
+# Append-only vitals/steps/calories history for the dashboard charts
+metric_series = MetricSeriesStore(
+    "metric_samples",
+    retention_days=int(os.getenv("METRIC_RETENTION_DAYS", 365)),
+)
+
+# WebSocket delta frames, coalesced and persisted once per interval
+live_sync = LiveSyncHub(
+    profile_store,
+    metric_series,
+    flush_interval=float(os.getenv("LIVE_SYNC_FLUSH_INTERVAL", 5)),
+    recommendation_interval=float(os.getenv("LIVE_RECOMMENDATION_INTERVAL", 900)),
+    recommend=agent.get_proactive_recommendation,
+)
+
+# Chat history is written behind the response, in insert_many batches
+chat_history_buffer = WriteBehindBuffer(
+    "chat_history",
+    max_batch=int(os.getenv("CHAT_HISTORY_BATCH_SIZE", 100)),
+    flush_interval=float(os.getenv("CHAT_HISTORY_FLUSH_INTERVAL", 1.0)),
+    max_pending=int(os.getenv("CHAT_HISTORY_MAX_PENDING", 5000)),
+)
+
+# Recent-turn window + rolling summary fed into the chat prompt
+conversation_memory = ConversationMemory(
+    chat_history_buffer,
+    window=int(os.getenv("CHAT_MEMORY_WINDOW", 6)),
+    compact_after=int(os.getenv("CHAT_MEMORY_COMPACT_AFTER", 10)),
+    summary_ttl=float(os.getenv("CHAT_MEMORY_SUMMARY_TTL", 3600)),
+    summarize=agent.summarize_conversation,
+)
+
+# Off-peak plan/recommendation precomputation for recently active users (None when disabled)
+precompute = PrecomputeScheduler.from_env(agent)
+
 @app.get("/")
 def read_root():
     return {"message": "Welcome to AroMi AI Health Coach API"}
@@ -55,10 +170,12 @@ def read_root():
 @app.get("/user/{user_id}")
 async def get_user(user_id: str):
     try:
-        users_col, _, _, _ = get_collections()
-        user = await users_col.find_one({"user_id": user_id}, {"_id": 0})
+        user = await profile_store.get(user_id)
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
+        # Returning sessions are restored through here, not /login
+        if precompute is not None:
+            await precompute.mark_active(user_id)
         return user
     except Exception as e:
         if isinstance(e, HTTPException): raise e
@@ -76,8 +193,8 @@ async def login_endpoint(request: dict):
         
         # Normalize email for case-insensitive lookup
         user_id = email.lower().strip().replace("@", "_").replace(".", "_")
-        users_col, _, _, _ = get_collections()
-        user = await users_col.find_one({"user_id": user_id}, {"_id": 0})
+        # Also warms the profile cache that session-mode agent requests are served from
+        user = await profile_store.get(user_id)
         
         if not user:
             raise HTTPException(status_code=404, detail="User not found. Please sign up first.")
@@ -86,6 +203,8 @@ async def login_endpoint(request: dict):
         if user.get("password") != password:
             raise HTTPException(status_code=401, detail="Invalid credentials. Security system rejected access.")
         
+        if precompute is not None:
+            await precompute.mark_active(user_id)
         return user
     except Exception as e:
         if isinstance(e, HTTPException): raise e
@@ -98,12 +217,18 @@ async def signup_endpoint(request: UserContext):
         # Normalize user_id to ensure consistency
         request.user_id = request.user_id.lower().strip()
         
-        # Check if user already exists
-        existing = await users_col.find_one({"user_id": request.user_id})
-        if existing:
+        # The unique index on user_id rejects existing (or concurrently created) users
+        if not Database.has_index("users", "user_id_unique"):
+            # Index missing (e.g. duplicate user_ids left over): check first, as before it existed
+            with span("mongo"):
+                if await users_col.find_one({"user_id": request.user_id}, {"_id": 1}):
+                    raise HTTPException(status_code=400, detail="User already exists with this email")
+        try:
+            with span("mongo"):
+                await users_col.insert_one({**request.model_dump(), "last_active": datetime.now(timezone.utc)})
+        except DuplicateKeyError:
             raise HTTPException(status_code=400, detail="User already exists with this email")
-        
-        await users_col.insert_one(request.model_dump())
+        profile_store.remember(request.model_dump())
         return {"status": "success", "user": request.model_dump()}
     except Exception as e:
         if isinstance(e, HTTPException): raise e
@@ -112,70 +237,423 @@ async def signup_endpoint(request: UserContext):
 @app.post("/user/update")
 async def update_user(request: UserContext):
     try:
-        users_col, _, _, _ = get_collections()
-        await users_col.update_one(
-            {"user_id": request.user_id},
-            {"$set": request.model_dump()},
-            upsert=True
-        )
-        return {"status": "success"}
+        # Only the fields that differ from the stored profile are written
+        update = await profile_store.save(request.user_id, request.model_dump())
+        return {"status": "success", "modified": bool(update)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.patch("/user/{user_id}")
+async def patch_user(user_id: str, request: UserContextPatch):
+    """Applies only the fields sent in the body to an existing profile."""
+    try:
+        changes = request.model_dump(exclude_unset=True)
+        applied = await profile_store.patch(user_id, changes)
+        if applied is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        return {"status": "success", "updated_fields": sorted(applied)}
     except Exception as e:
+        if isinstance(e, HTTPException): raise e
         raise HTTPException(status_code=500, detail=str(e))
 
+async def _resolve_context(request, persist: bool = False) -> UserContext:
+    """The context an agent request runs with.
+
+    Session mode (no `context` in the body): the cached profile, with the optional
+    small `context_delta` applied first. Legacy mode: the full context from the body,
+    saved to the profile (changed fields only) when `persist` is set, as /chat always did.
+    """
+    if request.context is not None:
+        if persist:
+            await profile_store.save(request.user_id, request.context.model_dump())
+        return request.context
+
+    if request.context_delta is not None:
+        changes = request.context_delta.model_dump(exclude_unset=True)
+        changes.pop("password", None)  # Credentials only change through /user/update
+        if changes and await profile_store.patch(request.user_id, changes) is None:
+            raise HTTPException(status_code=404, detail="Session not found. Please log in again.")
+    # Includes live vitals that haven't been flushed yet
+    context = await live_sync.current_context(request.user_id)
+    if context is None:
+        raise HTTPException(status_code=404, detail="Session not found. Please log in again.")
+    return context.model_copy(update={"password": None})
+
 @app.post("/chat")
 async def chat_endpoint(request: ChatRequest):
     try:
-        users_col, chat_col, _, _ = get_collections()
+        context = await _resolve_context(request, persist=True)
         
-        # Persist/Update user context in MongoDB
-        user_data = request.context.model_dump()
-        await users_col.update_one(
-            {"user_id": request.user_id},
-            {"$set": user_data},
-            upsert=True
-        )
+        # Generate AI response with the conversation memory
+        summary, turns = await conversation_memory.load(request.user_id)
+        response_text = await agent.generate_response(request.message, context, summary, turns)
         
-        # Generate AI response
-        response_text = agent.generate_response(request.message, request.context)
-        
-        # Save chat history
-        await chat_col.insert_one({
+        # Save chat history (buffered, flushed in batches)
+        await chat_history_buffer.add({
+            "_id": ObjectId(),  # Assigned up front so buffered turns can anchor a history cursor
             "user_id": request.user_id,
             "message": request.message,
-            "response": response_text
+            "response": response_text,
+            "timestamp": datetime.now(timezone.utc)
         })
+        conversation_memory.note_turn(request.user_id)
         
         return {
             "response": response_text,
-            "updated_context": request.context
+            "updated_context": context
         }
+    except Exception as e:
+        if isinstance(e, HTTPException): raise e
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/chat/history/{user_id}")
+async def get_chat_history(user_id: str, limit: int = Query(20, ge=1, le=100), cursor: Optional[str] = None):
+    """Newest-first chat turns; pass next_cursor back to fetch the next page."""
+    try:
+        return await conversation_memory.page(user_id, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _sse_event(data: dict, event: str = None) -> str:
+    """Formats one Server-Sent Events frame."""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+def _sse_response(events) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest):
+    """Same as /chat, but forwards tokens as Server-Sent Events while Groq generates them."""
+    try:
+        context = await _resolve_context(request, persist=True)
+        summary, turns = await conversation_memory.load(request.user_id)
+    except Exception as e:
+        if isinstance(e, HTTPException): raise e
+        raise HTTPException(status_code=500, detail=str(e))
+
+    async def events():
+        chunks = []
+        async for delta in agent.stream_response(request.message, context, summary, turns):
+            chunks.append(delta)
+            yield _sse_event({"delta": delta})
+        response_text = "".join(chunks)
+        yield _sse_event({"response": response_text}, event="done")
+
+        # Save chat history once the full reply is known
+        try:
+            await chat_history_buffer.add({
+                "_id": ObjectId(),
+                "user_id": request.user_id,
+                "message": request.message,
+                "response": response_text,
+                "timestamp": datetime.now(timezone.utc)
+            })
+            conversation_memory.note_turn(request.user_id)
+        except Exception as e:
+            print(f"Chat history write error: {e}")
+
+    return _sse_response(events())
+
+@app.post("/timeseries/ingest")
+async def ingest_metrics(request: MetricIngestRequest):
+    """Appends metric samples (no profile rewrite)."""
+    unknown = sorted({s.metric for s in request.samples} - set(METRICS))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown metric(s): {', '.join(unknown)}")
+    try:
+        inserted = await metric_series.ingest(request.user_id, request.samples)
+        return {"status": "success", "inserted": inserted}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/timeseries/{user_id}/{metric}")
+async def get_metric_series(
+    user_id: str,
+    metric: str,
+    bucket: str = Query("hour", pattern="^(minute|hour|day)$"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+):
+    """Downsampled min/max/avg series for one metric."""
+    if metric not in METRICS:
+        raise HTTPException(status_code=404, detail=f"Unknown metric: {metric}")
+    try:
+        points = await metric_series.series(user_id, metric, bucket, start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"metric": metric, "bucket": bucket, "points": points}
+
+@app.websocket("/ws/{user_id}")
+async def live_sync_socket(websocket: WebSocket, user_id: str):
+    """Persistent channel: clients send small delta frames, the server pushes recommendations.
+
+    Client frames: {"heart_rate": 72, "steps": 1200, "energy_level": 6}
+                   {"type": "recommendation"} to ask for a fresh tip
+    """
+    await websocket.accept()
+    if await profile_store.get(user_id) is None:
+        await websocket.close(code=4404, reason="User not found")
+        return
+
+    live_sync.connect(user_id, websocket)
+    background = set()
+
+    def in_background(coro):
+        task = asyncio.create_task(coro)
+        background.add(task)
+        task.add_done_callback(background.discard)
+
+    try:
+        in_background(live_sync.maybe_recommend(user_id))
+        while True:
+            frame = await websocket.receive_json()
+            if not isinstance(frame, dict):
+                await websocket.send_json({"type": "error", "detail": "Frames must be JSON objects"})
+                continue
+            if frame.get("type") == "recommendation":
+                in_background(live_sync.maybe_recommend(user_id, force=True))
+                continue
+            try:
+                delta = live_sync.apply(user_id, frame)
+            except FrameError as e:
+                await websocket.send_json({"type": "error", "detail": str(e)})
+                continue
+            if "energy_level" in delta:
+                in_background(live_sync.maybe_recommend(user_id))
+    except (WebSocketDisconnect, json.JSONDecodeError):
+        pass
+    finally:
+        live_sync.disconnect(user_id, websocket)
+        for task in background:
+            task.cancel()
+
 @app.post("/recommendation")
 async def get_recommendation(context: UserContext):
-    rec = agent.get_proactive_recommendation(context)
+    rec = agent.cached_recommendation(context)
+    if rec is not None:
+        return rec
+    if precompute is not None:
+        rec = await precompute.get_recommendation(context)
+        if rec is not None:
+            return rec
+    rec = await agent.get_proactive_recommendation(context)
     return rec
 
 @app.post("/wellness-plan")
 async def get_wellness_plan(context: UserContext):
-    return agent.generate_wellness_plan(context)
+    plan = agent.cached_wellness_plan(context)
+    if plan is not None:
+        return plan
+    if precompute is not None:
+        plan = await precompute.get("wellness_plan", context)
+        if plan is not None:
+            return plan
+    return await agent.generate_wellness_plan(context)
 
 @app.post("/clarify-doubt")
 async def clarify_doubt_endpoint(request: DoubtRequest):
-    answer = agent.clarify_doubt(request.question, request.context)
+    context = await _resolve_context(request)
+    answer = await agent.clarify_doubt(request.question, context)
     return {"answer": answer}
 
+@app.post("/clarify-doubt/stream")
+async def clarify_doubt_stream_endpoint(request: DoubtRequest):
+    """Same as /clarify-doubt, but streams the answer as Server-Sent Events."""
+    context = await _resolve_context(request)
+
+    async def events():
+        chunks = []
+        async for delta in agent.stream_doubt(request.question, context):
+            chunks.append(delta)
+            yield _sse_event({"delta": delta})
+        yield _sse_event({"answer": "".join(chunks)}, event="done")
+
+    return _sse_response(events())
+
+def _image_http_error(e: ImageRejected) -> HTTPException:
+    return HTTPException(status_code=413 if isinstance(e, ImageTooLarge) else 400, detail=str(e))
+
+async def _submit_analysis(kind: str, user_id: str, image, context: UserContext) -> JSONResponse:
+    """Validates and downscales the image up front, so bad images fail now and the queue holds small ones."""
+    try:
+        with span("image_prepare"):
+            image = await asyncio.to_thread(prepare_image, image, kind)
+    except ImageRejected as e:
+        raise _image_http_error(e)
+    try:
+        job = await analysis_jobs.submit(kind, user_id, image, context)
+    except QueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    return JSONResponse(
+        status_code=202,
+        content={"job_id": job["job_id"], "status": job["status"], "poll_url": f"/jobs/{job['job_id']}"}
+    )
+
 @app.post("/analyze-meal")
-async def analyze_meal_endpoint(request: MealAnalysisRequest):
-    insight = agent.analyze_meal(request.image_data, request.context)
+async def analyze_meal_endpoint(request: MealAnalysisRequest, background: bool = False):
+    context = await _resolve_context(request)
+    if background:
+        return await _submit_analysis("meal", request.user_id, request.image_data, context)
+    try:
+        insight = await agent.analyze_meal(request.image_data, context)
+    except ImageRejected as e:
+        raise _image_http_error(e)
     return {"insight": insight}
 
 @app.post("/analyze-prescription")
-async def analyze_prescription_endpoint(request: PrescriptionAnalysisRequest):
-    analysis = agent.analyze_prescription(request.image_data, request.context)
+async def analyze_prescription_endpoint(request: PrescriptionAnalysisRequest, background: bool = False):
+    context = await _resolve_context(request)
+    if background:
+        return await _submit_analysis("prescription", request.user_id, request.image_data, context)
+    try:
+        analysis = await agent.analyze_prescription(request.image_data, context)
+    except ImageRejected as e:
+        raise _image_http_error(e)
     return {"analysis": analysis}
 
+# Room for the multipart boundaries and form fields on top of the image size cap
+UPLOAD_FORM_OVERHEAD = 64 * 1024
+
+async def _read_image_upload(request: Request, endpoint: str):
+    """Parses a multipart upload: a binary `file` part plus user_id and optional context/context_delta JSON.
+
+    The form parser spools the file to a temporary file instead of buffering the body,
+    and oversized uploads are refused from Content-Length before anything is read.
+    """
+    max_bytes = IMAGE_PROFILES[endpoint].max_bytes
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > max_bytes + UPLOAD_FORM_OVERHEAD:
+        raise _image_http_error(ImageTooLarge(f"Image exceeds the {max_bytes // (1024 * 1024)} MB limit."))
+    try:
+        form = await request.form(max_files=1, max_fields=5)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Expected a multipart/form-data body with a 'file' part.")
+    try:
+        upload = form.get("file")
+        if not isinstance(upload, UploadFile):
+            raise HTTPException(status_code=422, detail="Missing 'file' part.")
+        fields = {"user_id": form.get("user_id")}
+        for name in ("context", "context_delta"):
+            if form.get(name):
+                fields[name] = json.loads(form[name])
+        upload_request = ImageUploadRequest(**fields)
+        data = await read_upload(upload, endpoint)
+    except (ValueError, ValidationError) as e:
+        if isinstance(e, ImageRejected):
+            raise _image_http_error(e)
+        raise HTTPException(status_code=422, detail=str(e))
+    finally:
+        await form.close()
+    return upload_request, data
+
+@app.post("/analyze-meal/upload")
+async def analyze_meal_upload_endpoint(request: Request, background: bool = False):
+    """Multipart variant of /analyze-meal: the image is sent as raw bytes, not base64 in JSON."""
+    with span("upload_read"):
+        upload_request, data = await _read_image_upload(request, "meal")
+    context = await _resolve_context(upload_request)
+    if background:
+        return await _submit_analysis("meal", upload_request.user_id, data, context)
+    try:
+        insight = await agent.analyze_meal(data, context)
+    except ImageRejected as e:
+        raise _image_http_error(e)
+    return {"insight": insight}
+
+@app.post("/analyze-prescription/upload")
+async def analyze_prescription_upload_endpoint(request: Request, background: bool = False):
+    """Multipart variant of /analyze-prescription."""
+    with span("upload_read"):
+        upload_request, data = await _read_image_upload(request, "prescription")
+    context = await _resolve_context(upload_request)
+    if background:
+        return await _submit_analysis("prescription", upload_request.user_id, data, context)
+    try:
+        analysis = await agent.analyze_prescription(data, context)
+    except ImageRejected as e:
+        raise _image_http_error(e)
+    return {"analysis": analysis}
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = await analysis_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """Pushes job status changes as Server-Sent Events until the job finishes."""
+    job = await analysis_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def events():
+        current = job
+        last_status = None
+        while True:
+            if current["status"] != last_status:
+                last_status = current["status"]
+                yield _sse_event(current, event=last_status)
+            if last_status in ("completed", "failed"):
+                return
+            await analysis_jobs.wait(job_id, timeout=1.0)
+            current = await analysis_jobs.get(job_id) or current
+
+    return _sse_response(events())
+
+def _component_stats() -> dict:
+    return {
+        "llm_cache": agent.response_cache.stats(),
+        "singleflight": agent.inflight.stats(),
+        "groq_upstream": agent.client.stats(),
+        "model_router": agent.router.stats(),
+        "output_contracts": {name: contract.stats() for name, contract in agent.contracts.items()},
+        "intents": agent.intents.stats(),
+        "doubt_cache": agent.doubt_cache.stats() if agent.doubt_cache is not None else {"enabled": False},
+        "vision_cache": agent.vision_cache.stats(),
+        "analysis_jobs": analysis_jobs.stats(),
+        "chat_history_buffer": chat_history_buffer.stats(),
+        "profile_store": profile_store.stats(),
+        "metric_series": metric_series.stats(),
+        "live_sync": live_sync.stats(),
+        "conversation_memory": conversation_memory.stats(),
+        "rate_limiter": rate_limiter.stats(),
+        "precompute": precompute.stats() if precompute is not None else {"enabled": False},
+    }
+
+@app.get("/stats")
+def get_stats():
+    return _component_stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Prometheus text exposition: request/phase timings plus the component stats as gauges."""
+    stats = _component_stats()
+    if profiler is not None:
+        stats["profiler"] = profiler.stats()
+    lines = trace_registry.render() + render_stats(stats)
+    return PlainTextResponse("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
+
+@app.get("/debug/profile", response_class=PlainTextResponse)
+def get_profile(limit: int = Query(200, ge=0), reset: bool = False):
+    """Collapsed stacks from the sampling profiler (feed to flamegraph.pl or speedscope)."""
+    if profiler is None:
+        raise HTTPException(status_code=404, detail="Profiler is disabled. Set PROFILER_ENABLED=1.")
+    body = profiler.collapsed(limit)
+    if reset:
+        profiler.reset()
+    return PlainTextResponse(body)
+
 @app.get("/store")
 def get_store_items():
     return [
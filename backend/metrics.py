@@ -0,0 +1,31 @@
+"""
+Small in-process metric helpers shared by the backend components
+"""
+from collections import deque
+from typing import Dict
+
+
+class LatencyWindow:
+    """Keeps the most recent samples (seconds) to report percentiles."""
+
+    def __init__(self, size: int = 1000):
+        self._samples = deque(maxlen=size)
+        self.count = 0
+        self.total = 0.0
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+    def percentile(self, q: float) -> float:
+        if not self._samples:
+            return 0.0
+        ordered = sorted(self._samples)
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 4)
+
+    def summary(self, prefix: str) -> Dict[str, float]:
+        return {
+            f"{prefix}_p50": self.percentile(0.50),
+            f"{prefix}_p95": self.percentile(0.95),
+        }
@@ -1,5 +1,6 @@
 from pydantic import BaseModel
 from typing import List, Optional
+from datetime import datetime
 
 class UserContext(BaseModel):
     user_id: str
@@ -31,6 +32,26 @@ class UserContext(BaseModel):
     location: Optional[str] = None
     last_interaction: Optional[str] = None
 
+class UserContextPatch(BaseModel):
+    """Partial profile update: only the fields that changed are sent."""
+    password: Optional[str] = None
+    name: Optional[str] = None
+    age: Optional[int] = None
+    gender: Optional[str] = None
+    height: Optional[float] = None
+    weight: Optional[float] = None
+    mood: Optional[str] = None
+    energy_level: Optional[int] = None
+    activity_type: Optional[str] = None
+    lifestyle_inputs: Optional[dict] = None
+    health_goals: Optional[List[str]] = None
+    steps: Optional[int] = None
+    calories_burned: Optional[float] = None
+    todos: Optional[List[dict]] = None
+    vitals: Optional[dict] = None
+    location: Optional[str] = None
+    last_interaction: Optional[str] = None
+
 class ChatMessage(BaseModel):
     role: str # "user" or "assistant"
     content: str
@@ -38,24 +59,48 @@ class ChatMessage(BaseModel):
 class ChatRequest(BaseModel):
     user_id: str
     message: str
-    context: UserContext
+    context: Optional[UserContext] = None # Omit to use the server-side session context
+    context_delta: Optional[UserContextPatch] = None # Fields that changed since the last sync
 
 class Recommendation(BaseModel):
     category: str # "physical", "mental", "lifestyle"
     suggestion: str
     reasoning: str
 
+class WellnessPlan(BaseModel):
+    daily_tip: str
+    workout_plan: str
+    diet_suggestion: str
+
 class DoubtRequest(BaseModel):
     user_id: str
     question: str
-    context: UserContext
+    context: Optional[UserContext] = None
+    context_delta: Optional[UserContextPatch] = None
 
 class MealAnalysisRequest(BaseModel):
     user_id: str
     image_data: str # Base64 or URL
-    context: UserContext
+    context: Optional[UserContext] = None
+    context_delta: Optional[UserContextPatch] = None
 
 class PrescriptionAnalysisRequest(BaseModel):
     user_id: str
     image_data: str # Base64
-    context: UserContext
+    context: Optional[UserContext] = None
+    context_delta: Optional[UserContextPatch] = None
+
+class ImageUploadRequest(BaseModel):
+    """Form fields sent alongside a multipart image upload (context fields as JSON strings)."""
+    user_id: str
+    context: Optional[UserContext] = None
+    context_delta: Optional[UserContextPatch] = None
+
+class MetricSample(BaseModel):
+    metric: str # heart_rate, steps, calories_burned, energy_level, sleep_hours, bmi
+    value: float
+    timestamp: Optional[datetime] = None # defaults to ingestion time
+
+class MetricIngestRequest(BaseModel):
+    user_id: str
+    samples: List[MetricSample]
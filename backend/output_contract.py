@@ -0,0 +1,133 @@
+"""
+Validates structured LLM output against pydantic models, repairing near-valid responses
+"""
+import json
+import re
+from typing import Optional, Tuple, Type
+
+from pydantic import BaseModel, ValidationError
+
+# Outcome of a parse, from best to worst
+VALID, REPAIRED, PARTIAL, FAILED = "valid", "repaired", "partial", "failed"
+
+_FENCE = re.compile(r"^```(?:json)?\s*|\s*```$", re.IGNORECASE)
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+_KEY_LINE = re.compile(r"^\s*[-*]?\s*\**([A-Za-z][A-Za-z _]*?)\**\s*:\s*(.+?)\s*$")
+
+
+def _normalize_key(key: str) -> str:
+    return re.sub(r"[\s\-]+", "_", key.strip().lower())
+
+
+def _as_text(value) -> str:
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, list):
+        return "; ".join(_as_text(v) for v in value)
+    if isinstance(value, dict):
+        return "; ".join(f"{k}: {_as_text(v)}" for k, v in value.items())
+    return "" if value is None else str(value)
+
+
+def _load_object(text: str) -> Tuple[Optional[dict], bool]:
+    """Extracts a JSON object from `text`; the flag says whether it needed repairs."""
+    stripped = _FENCE.sub("", text.strip())
+    try:
+        data = json.loads(stripped)
+        if isinstance(data, dict):
+            return data, False
+    except ValueError:
+        pass
+
+    start, end = stripped.find("{"), stripped.rfind("}")
+    if start == -1 or end <= start:
+        return None, True
+    candidate = stripped[start:end + 1]
+    candidate = candidate.replace("“", '"').replace("”", '"').replace("’", "'")
+    candidate = _TRAILING_COMMA.sub(r"\1", candidate)
+    for attempt in (candidate, candidate.replace("'", '"')):
+        try:
+            data = json.loads(attempt)
+            if isinstance(data, dict):
+                return data, True
+        except ValueError:
+            continue
+    return None, True
+
+
+def _load_key_lines(text: str) -> dict:
+    """Falls back to `Key: value` lines, the format the model drifts into most often."""
+    data = {}
+    for line in text.splitlines():
+        match = _KEY_LINE.match(line)
+        if match:
+            data[match.group(1)] = match.group(2)
+    return data
+
+
+class OutputContract:
+    """Parses model output into `schema`, accepting as much of it as can be trusted.
+
+    Strictly valid JSON is `valid`. JSON that needed fixing (fences, prose around it,
+    trailing commas, renamed or non-string fields) is `repaired`. If only some fields
+    are usable but at least `min_fields` are, the rest comes from `defaults` and the
+    result is `partial`. Anything else is `failed`.
+    """
+
+    def __init__(self, name: str, schema: Type[BaseModel], min_fields: int = 1):
+        self.name = name
+        self.schema = schema
+        self.min_fields = min_fields
+        self.fields = list(schema.model_fields)
+        self.counters = {VALID: 0, REPAIRED: 0, PARTIAL: 0, FAILED: 0}
+
+    def _extract(self, text: str) -> Tuple[dict, bool]:
+        data, repaired = _load_object(text)
+        if data is None:
+            data, repaired = _load_key_lines(text), True
+        # Some responses wrap the object, e.g. {"plan": {...}}
+        if len(data) == 1 and isinstance(next(iter(data.values())), dict):
+            data, repaired = next(iter(data.values())), True
+
+        values = {}
+        for key, value in data.items():
+            field = _normalize_key(str(key))
+            if field in self.fields:
+                if field != key or not isinstance(value, str):
+                    repaired = True
+                text_value = _as_text(value)
+                if text_value:
+                    values[field] = text_value
+        return values, repaired
+
+    def _evaluate(self, text: str, defaults: Optional[dict]) -> Tuple[Optional[BaseModel], str]:
+        if not text:
+            return None, FAILED
+        values, repaired = self._extract(text)
+        try:
+            return self.schema(**values), REPAIRED if repaired else VALID
+        except ValidationError:
+            pass
+        if defaults is None or len(values) < self.min_fields:
+            return None, FAILED
+        try:
+            return self.schema(**{**defaults, **values}), PARTIAL
+        except ValidationError:
+            return None, FAILED
+
+    def accepts(self, text: str) -> bool:
+        """Whether `text` yields a complete object (used to decide on escalation); not counted."""
+        return self._evaluate(text, None)[0] is not None
+
+    def parse(self, text: str, defaults: Optional[dict] = None) -> Tuple[Optional[BaseModel], str]:
+        """Returns (object or None, outcome) and records the outcome."""
+        result, outcome = self._evaluate(text, defaults)
+        self.counters[outcome] += 1
+        return result, outcome
+
+    def stats(self) -> dict:
+        total = sum(self.counters.values())
+        return {
+            **self.counters,
+            "parse_failure_rate": round(self.counters[FAILED] / total, 4) if total else 0.0,
+        }
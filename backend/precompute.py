@@ -0,0 +1,214 @@
+"""
+Off-peak precomputation of daily wellness plans and recommendations
+"""
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from cache import TTLCache, context_fingerprint
+from models import Recommendation, UserContext
+from tracing import span
+
+# What is precomputed: kind -> collection name
+KINDS = {
+    "wellness_plan": "wellness_plans",
+    "recommendation": "recommendations",
+}
+
+# users.last_active is written at most this often per user (and worker)
+ACTIVE_MARK_INTERVAL = 3600
+
+
+def _as_utc(value: datetime) -> datetime:
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+class PrecomputeScheduler:
+    """Walks recently active users during an off-peak UTC window and stores their plan and tip.
+
+    Each stored result carries the context fingerprint it was generated for, so the
+    endpoints only serve it while the user's prompt-relevant context is unchanged
+    and the result is younger than `max_age`. Users whose result is still fresh
+    for at least half of `max_age` are skipped.
+    """
+
+    def __init__(self, agent, window_start: int, window_end: int, concurrency: int, active_days: int,
+                 max_age: float, check_interval: float):
+        self.agent = agent
+        self.window_start = window_start
+        self.window_end = window_end
+        self.concurrency = concurrency
+        self.active_days = active_days
+        self.max_age = max_age
+        self.check_interval = check_interval
+        self.users = None
+        self.collections = {}
+        self._task: Optional[asyncio.Task] = None
+        self._pass_lock = asyncio.Lock()
+        self._marked = TTLCache(maxsize=50000, ttl=ACTIVE_MARK_INTERVAL)
+        self._last_pass_day = None
+        self.passes = 0
+        self.users_scanned = 0
+        self.computed = 0
+        self.skipped = 0
+        self.failed = 0
+        self.served = 0
+        self.misses = 0
+        self.last_pass_seconds = 0.0
+        self.last_pass_at: Optional[str] = None
+
+    @classmethod
+    def from_env(cls, agent) -> Optional["PrecomputeScheduler"]:
+        if os.getenv("PRECOMPUTE_ENABLED", "1") != "1":
+            return None
+        return cls(
+            agent,
+            window_start=int(os.getenv("PRECOMPUTE_WINDOW_START_HOUR", 1)),
+            window_end=int(os.getenv("PRECOMPUTE_WINDOW_END_HOUR", 5)),
+            concurrency=int(os.getenv("PRECOMPUTE_CONCURRENCY", 4)),
+            active_days=int(os.getenv("PRECOMPUTE_ACTIVE_DAYS", 7)),
+            max_age=float(os.getenv("PRECOMPUTE_MAX_AGE", 24 * 3600)),
+            check_interval=float(os.getenv("PRECOMPUTE_CHECK_INTERVAL", 300)),
+        )
+
+    async def start(self, db):
+        self.users = db.get_collection("users")
+        for kind, name in KINDS.items():
+            self.collections[kind] = db.get_collection(name)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def mark_active(self, user_id: str):
+        """Keeps the user in the active set the off-peak pass walks."""
+        if self.users is None or self._marked.get(user_id):
+            return
+        self._marked.set(user_id, True)
+        try:
+            with span("mongo"):
+                await self.users.update_one({"user_id": user_id}, {"$set": {"last_active": datetime.now(timezone.utc)}})
+        except Exception as e:
+            self._marked.invalidate(user_id)
+            print(f"Active-user mark error: {e}")
+
+    def in_window(self, now: datetime) -> bool:
+        if self.window_start <= self.window_end:
+            return self.window_start <= now.hour < self.window_end
+        return now.hour >= self.window_start or now.hour < self.window_end  # Window wraps midnight
+
+    async def _run(self):
+        while True:
+            now = datetime.now(timezone.utc)
+            if self.agent.use_ai and self.in_window(now) and self._last_pass_day != now.date():
+                self._last_pass_day = now.date()
+                try:
+                    await self.run_pass()
+                except Exception as e:
+                    print(f"Precompute pass error: {e}")
+            await asyncio.sleep(self.check_interval)
+
+    async def run_pass(self, respect_window: bool = True):
+        """Precomputes for every active user, `concurrency` users at a time."""
+        async with self._pass_lock:
+            await self._walk_users(respect_window)
+
+    async def _walk_users(self, respect_window: bool):
+        started = time.perf_counter()
+        cutoff = datetime.now(timezone.utc) - timedelta(days=self.active_days)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        pending = set()
+
+        async def one(doc):
+            async with semaphore:
+                await self._precompute_user(doc)
+
+        cursor = self.users.find({"last_active": {"$gte": cutoff}}, {"_id": 0, "password": 0})
+        async for doc in cursor:
+            if respect_window and not self.in_window(datetime.now(timezone.utc)):
+                print("Precompute window closed; resuming in the next one")
+                break
+            self.users_scanned += 1
+            pending.add(asyncio.create_task(one(doc)))
+            if len(pending) >= self.concurrency * 2:
+                # Don't pull the whole user collection into tasks at once
+                _, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        if pending:
+            await asyncio.gather(*pending)
+
+        self.passes += 1
+        self.last_pass_seconds = round(time.perf_counter() - started, 2)
+        self.last_pass_at = datetime.now(timezone.utc).isoformat()
+        print(f"✓ Precompute pass: {self.users_scanned} users scanned, {self.computed} results stored so far")
+
+    async def _precompute_user(self, doc: dict):
+        try:
+            context = UserContext(**doc)
+        except Exception:
+            self.failed += 1
+            return
+        fingerprint = context_fingerprint(context)
+        for kind, collection in self.collections.items():
+            try:
+                existing = await collection.find_one({"user_id": context.user_id}, {"fingerprint": 1, "computed_at": 1})
+                if existing and existing.get("fingerprint") == fingerprint and \
+                        self._age(existing["computed_at"]) < self.max_age / 2:
+                    self.skipped += 1
+                    continue
+                if kind == "wellness_plan":
+                    value = await self.agent.generate_wellness_plan(context, fallback=False)
+                else:
+                    rec = await self.agent.get_proactive_recommendation(context, fallback=False)
+                    value = rec.model_dump() if rec is not None else None
+                if value is None:
+                    self.failed += 1  # Offline answers are left to the live path
+                    continue
+                await collection.update_one(
+                    {"user_id": context.user_id},
+                    {"$set": {"fingerprint": fingerprint, "value": value, "computed_at": datetime.now(timezone.utc)}},
+                    upsert=True,
+                )
+                self.computed += 1
+            except Exception as e:
+                self.failed += 1
+                print(f"Precompute error ({kind}, {context.user_id}): {e}")
+
+    def _age(self, computed_at: datetime) -> float:
+        return (datetime.now(timezone.utc) - _as_utc(computed_at)).total_seconds()
+
+    async def get(self, kind: str, context: UserContext) -> Optional[dict]:
+        """The stored result for this user if it matches their current context and is fresh."""
+        collection = self.collections.get(kind)
+        if collection is None:
+            return None
+        with span("mongo"):
+            doc = await collection.find_one({"user_id": context.user_id})
+        if doc is None or doc.get("fingerprint") != context_fingerprint(context) \
+                or self._age(doc["computed_at"]) > self.max_age:
+            self.misses += 1
+            return None
+        self.served += 1
+        return doc["value"]
+
+    async def get_recommendation(self, context: UserContext) -> Optional[Recommendation]:
+        value = await self.get("recommendation", context)
+        return Recommendation(**value) if value is not None else None
+
+    def stats(self) -> dict:
+        return {
+            "window_utc": f"{self.window_start:02d}:00-{self.window_end:02d}:00",
+            "passes": self.passes,
+            "last_pass_at": self.last_pass_at,
+            "last_pass_seconds": self.last_pass_seconds,
+            "users_scanned": self.users_scanned,
+            "computed": self.computed,
+            "skipped_fresh": self.skipped,
+            "failed": self.failed,
+            "served": self.served,
+            "misses": self.misses,
+        }
@@ -0,0 +1,229 @@
+"""
+Profile cache and persistence for the users collection using minimal field-level updates
+"""
+import asyncio
+import copy
+from typing import Optional
+
+from cache import TTLCache
+from tracing import span
+
+SCALAR_TYPES = (str, int, float, bool, type(None))
+
+
+def _safe_key(key) -> bool:
+    return isinstance(key, str) and key and "." not in key and not key.startswith("$")
+
+
+def _diff_list(key: str, old: list, new: list, set_ops: dict, push_ops: dict, pull_ops: dict):
+    if len(new) > len(old) and new[:len(old)] == old:
+        # Items appended at the end (e.g. a new todo)
+        push_ops[key] = {"$each": new[len(old):]}
+        return
+
+    if len(new) < len(old) and all(isinstance(v, SCALAR_TYPES) for v in old):
+        removed = list(old)
+        for value in new:
+            if value in removed:
+                removed.remove(value)
+        # $pull drops every equal element, so it only fits if none of them survive
+        remaining = [v for v in old if v not in removed]
+        if remaining == new:
+            pull_ops[key] = {"$in": removed}
+            return
+
+    if len(new) == len(old):
+        changed = [i for i, (a, b) in enumerate(zip(old, new)) if a != b]
+        if len(changed) * 2 <= len(new):
+            # A few edited items (e.g. a todo toggled done)
+            for i in changed:
+                set_ops[f"{key}.{i}"] = new[i]
+            return
+
+    set_ops[key] = new
+
+
+def compute_update(old: dict, new: dict) -> dict:
+    """Builds the smallest $set/$push/$pull update turning `old` into `new`.
+
+    Only fields present in `new` are considered; an empty dict means nothing changed.
+    """
+    set_ops, push_ops, pull_ops = {}, {}, {}
+    for key, value in new.items():
+        if key == "_id":
+            continue
+        if key not in old:
+            set_ops[key] = value
+            continue
+        prev = old[key]
+        if prev == value:
+            continue
+        if isinstance(prev, dict) and isinstance(value, dict) and set(value) >= set(prev) and all(map(_safe_key, value)):
+            for sub_key, sub_value in value.items():
+                if sub_key not in prev or prev[sub_key] != sub_value:
+                    set_ops[f"{key}.{sub_key}"] = sub_value
+        elif isinstance(prev, list) and isinstance(value, list):
+            _diff_list(key, prev, value, set_ops, push_ops, pull_ops)
+        else:
+            set_ops[key] = value
+
+    update = {}
+    if set_ops:
+        update["$set"] = set_ops
+    if push_ops:
+        update["$push"] = push_ops
+    if pull_ops:
+        update["$pull"] = pull_ops
+    return update
+
+
+def _list_guard(old: dict, update: dict) -> dict:
+    """Filter pinning the lists an update edits in place to the values the diff was computed on.
+
+    $push/$pull and positional $set aren't idempotent; applied to a list that changed
+    meanwhile (a concurrent save, another worker) they would corrupt it.
+    """
+    keys = set(update.get("$push", {})) | set(update.get("$pull", {}))
+    for path in update.get("$set", {}):
+        head = path.split(".")[0]
+        if "." in path and isinstance(old.get(head), list):
+            keys.add(head)
+    return {key: old[key] for key in keys}
+
+
+class ProfileStore:
+    """Read-through cache in front of the users collection.
+
+    Writes go through the cache (diffed against the cached copy) so it stays
+    current for this worker. Without change streams another worker's writes are
+    only picked up once the entry expires, so keep the TTL short in that setup.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.collection = None
+        self._snapshots = TTLCache(maxsize, ttl)
+        self._watch_task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.skipped = 0
+        self.full_writes = 0
+        self.conflicts = 0
+        self.change_events = 0
+
+    def attach(self, collection):
+        self.collection = collection
+
+    async def start_change_stream(self):
+        """Keeps the cache coherent with writes from other workers (needs a replica set)."""
+        self._watch_task = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            await asyncio.gather(self._watch_task, return_exceptions=True)
+            self._watch_task = None
+
+    async def _watch(self):
+        try:
+            async with self.collection.watch(full_document="updateLookup") as stream:
+                print("✓ Profile cache subscribed to users change stream")
+                async for change in stream:
+                    self.change_events += 1
+                    doc = change.get("fullDocument")
+                    if doc and doc.get("user_id"):
+                        self.remember(doc)
+                    elif change.get("operationType") in ("delete", "drop", "invalidate"):
+                        # Deletes only carry _id, so drop everything rather than serve a stale profile
+                        self._snapshots.clear()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"✗ Profile change stream stopped: {e}")
+
+    def remember(self, doc: dict):
+        """Records `doc` as the current persisted state of the user."""
+        snapshot = {k: v for k, v in doc.items() if k != "_id"}
+        self._snapshots.set(doc["user_id"], copy.deepcopy(snapshot))
+
+    def forget(self, user_id: str):
+        self._snapshots.invalidate(user_id)
+
+    async def _current(self, user_id: str) -> Optional[dict]:
+        snapshot = self._snapshots.get(user_id)
+        if snapshot is not None:
+            self.hits += 1
+            return snapshot
+        self.misses += 1
+        with span("mongo"):
+            doc = await self.collection.find_one({"user_id": user_id}, {"_id": 0})
+        if doc is not None:
+            self.remember(doc)
+        return doc
+
+    async def get(self, user_id: str) -> Optional[dict]:
+        """Returns a copy of the profile, reading MongoDB only on a cache miss."""
+        doc = await self._current(user_id)
+        return copy.deepcopy(doc) if doc is not None else None
+
+    async def save(self, user_id: str, new: dict) -> dict:
+        """Upserts the profile, sending only what differs. Returns the update issued."""
+        old = await self._current(user_id)
+        if old is None:
+            update = {"$set": new}
+            self.full_writes += 1
+        else:
+            update = compute_update(old, new)
+            if not update:
+                self.skipped += 1
+                return {}
+
+        guard = _list_guard(old, update) if old is not None else {}
+        try:
+            with span("mongo"):
+                result = await self.collection.update_one({"user_id": user_id, **guard}, update, upsert=not guard)
+            if guard and result.matched_count == 0:
+                # The stored lists no longer match our snapshot; write the whole profile instead
+                self.conflicts += 1
+                self.full_writes += 1
+                update = {"$set": new}
+                with span("mongo"):
+                    await self.collection.update_one({"user_id": user_id}, update, upsert=True)
+        except Exception:
+            # The snapshot may no longer match what's stored
+            self.forget(user_id)
+            raise
+        self.writes += 1
+        self.remember({**(old or {}), **new, "user_id": user_id})
+        return update
+
+    async def patch(self, user_id: str, changes: dict) -> Optional[dict]:
+        """Applies a partial update to an existing profile; None if the user doesn't exist.
+
+        Nested objects (vitals, lifestyle_inputs) are merged like a JSON merge patch.
+        """
+        old = await self._current(user_id)
+        if old is None:
+            return None
+        new = dict(old)
+        for key, value in changes.items():
+            if isinstance(value, dict) and isinstance(old.get(key), dict):
+                value = {**old[key], **value}
+            new[key] = value
+        await self.save(user_id, new)
+        return changes
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._snapshots),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "change_stream": self._watch_task is not None and not self._watch_task.done(),
+            "change_events": self.change_events,
+            "writes": self.writes,
+            "full_writes": self.full_writes,
+            "list_conflicts": self.conflicts,
+            "skipped_noop": self.skipped,
+        }
@@ -0,0 +1,214 @@
+"""
+Per-user and global token-bucket admission control for the Groq-backed endpoints
+"""
+import asyncio
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from starlette.responses import JSONResponse
+
+from cache import TTLCache
+
+# Default budgets per endpoint class:
+# (per-user requests/minute, per-user burst, global requests/second, global burst)
+# Override with RATE_LIMIT_<CLASS>_USER_RPM / _USER_BURST / _GLOBAL_RPS / _GLOBAL_BURST.
+DEFAULT_BUDGETS = {
+    "text": (20, 5, 25.0, 50),
+    "vision": (6, 3, 5.0, 10),
+}
+
+# Path -> endpoint class for the routes that call Groq
+LIMITED_ROUTES = {
+    "/chat": "text",
+    "/chat/stream": "text",
+    "/clarify-doubt": "text",
+    "/clarify-doubt/stream": "text",
+    "/recommendation": "text",
+    "/wellness-plan": "text",
+    "/analyze-meal": "vision",
+    "/analyze-prescription": "vision",
+    "/analyze-meal/upload": "vision",
+    "/analyze-prescription/upload": "vision",
+}
+
+
+@dataclass
+class Budget:
+    user_rate: float  # tokens per second
+    user_burst: int
+    global_rate: float
+    global_burst: int
+
+
+def load_budgets() -> Dict[str, Budget]:
+    budgets = {}
+    for name, (user_rpm, user_burst, global_rps, global_burst) in DEFAULT_BUDGETS.items():
+        prefix = f"RATE_LIMIT_{name.upper()}"
+        budgets[name] = Budget(
+            user_rate=float(os.getenv(f"{prefix}_USER_RPM", user_rpm)) / 60.0,
+            user_burst=int(os.getenv(f"{prefix}_USER_BURST", user_burst)),
+            global_rate=float(os.getenv(f"{prefix}_GLOBAL_RPS", global_rps)),
+            global_burst=int(os.getenv(f"{prefix}_GLOBAL_BURST", global_burst)),
+        )
+    return budgets
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self) -> float:
+        """Seconds until one token is available (0 if one is available now)."""
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """A request is admitted only when both its user bucket and the global bucket have a token.
+
+    If the wait is short (<= max_wait) the request is held briefly instead of rejected.
+    """
+
+    def __init__(self, budgets: Dict[str, Budget], max_wait: float, max_users: int = 100000):
+        self.budgets = budgets
+        self.max_wait = max_wait
+        self._global = {name: TokenBucket(b.global_rate, b.global_burst) for name, b in budgets.items()}
+        # Idle user buckets expire once they would have refilled anyway
+        self._users = TTLCache(maxsize=max_users, ttl=600)
+        self.counters = {name: {"allowed": 0, "queued": 0, "rejected": 0} for name in budgets}
+
+    def _user_bucket(self, endpoint_class: str, identity: str) -> TokenBucket:
+        key = f"{endpoint_class}:{identity}"
+        bucket = self._users.get(key)
+        if bucket is None:
+            budget = self.budgets[endpoint_class]
+            bucket = TokenBucket(budget.user_rate, budget.user_burst)
+            self._users.set(key, bucket)
+        return bucket
+
+    def _try_take(self, endpoint_class: str, identity: str) -> float:
+        now = time.monotonic()
+        user_bucket = self._user_bucket(endpoint_class, identity)
+        global_bucket = self._global[endpoint_class]
+        user_bucket.refill(now)
+        global_bucket.refill(now)
+        wait = max(user_bucket.wait_time(), global_bucket.wait_time())
+        if wait == 0:
+            user_bucket.tokens -= 1
+            global_bucket.tokens -= 1
+        return wait
+
+    async def acquire(self, endpoint_class: str, identity: str) -> Optional[float]:
+        """Returns None when admitted, otherwise the Retry-After in seconds."""
+        counters = self.counters[endpoint_class]
+        deadline = time.monotonic() + self.max_wait
+        queued = False
+        while True:
+            wait = self._try_take(endpoint_class, identity)
+            if wait == 0:
+                counters["allowed"] += 1
+                return None
+            if time.monotonic() + wait > deadline:
+                counters["rejected"] += 1
+                return wait
+            if not queued:
+                counters["queued"] += 1
+                queued = True
+            await asyncio.sleep(wait)
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        result = {"tracked_users": len(self._users)}
+        for name, bucket in self._global.items():
+            bucket.refill(now)
+            result[name] = {**self.counters[name], "global_tokens": round(bucket.tokens, 2)}
+        return result
+
+
+# JSON bodies up to this size are read to key the bucket on their user_id
+IDENTITY_BODY_LIMIT = 64 * 1024
+
+
+class RateLimitMiddleware:
+    """ASGI middleware answering over-limit requests with a fast 429.
+
+    Callers are identified by the `user_id` of small JSON bodies (every text route
+    sends one). Uploads and large base64 bodies aren't read for this; they use the
+    X-User-Id header the frontend sends, then the client IP.
+
+    There is no authentication, so neither identity is trusted: a client can rotate
+    user_ids to get fresh per-user buckets. The global buckets are the real cap on
+    Groq spend; the per-user ones only keep honest clients from starving each other.
+    """
+
+    def __init__(self, app, limiter: RateLimiter, routes: Dict[str, str] = LIMITED_ROUTES):
+        self.app = app
+        self.limiter = limiter
+        self.routes = routes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["method"] == "POST":
+            endpoint_class = self.routes.get(scope["path"])
+            if endpoint_class is not None:
+                identity, receive = await self._identity(scope, receive)
+                retry_after = await self.limiter.acquire(endpoint_class, identity)
+                if retry_after is not None:
+                    response = JSONResponse(
+                        status_code=429,
+                        content={"detail": "Too many requests. Please slow down."},
+                        headers={"Retry-After": str(max(1, round(retry_after)))},
+                    )
+                    await response(scope, receive, send)
+                    return
+        await self.app(scope, receive, send)
+
+    async def _identity(self, scope, receive):
+        """Returns the caller's bucket key and a `receive` that still yields the full body."""
+        headers = dict(scope.get("headers", []))
+        content_type = headers.get(b"content-type", b"").decode("latin-1")
+        try:
+            length = int(headers.get(b"content-length", b"-1"))
+        except ValueError:
+            length = -1
+        if content_type.startswith("application/json") and 0 <= length <= IDENTITY_BODY_LIMIT:
+            messages, body = [], b""
+            while True:
+                message = await receive()
+                messages.append(message)
+                body += message.get("body", b"")
+                if message["type"] != "http.request" or not message.get("more_body"):
+                    break
+            receive = _replay(messages, receive)
+            try:
+                user_id = json.loads(body).get("user_id")
+            except (ValueError, AttributeError):
+                user_id = None
+            if isinstance(user_id, str) and user_id:
+                return "user:" + user_id.lower().strip(), receive
+
+        value = headers.get(b"x-user-id")
+        if value:
+            return "user:" + value.decode("latin-1").lower().strip(), receive
+        client = scope.get("client")
+        return "ip:" + (client[0] if client else "unknown"), receive
+
+
+def _replay(messages: list, receive):
+    """A `receive` that hands back the already-read messages before reading on."""
+    pending = list(messages)
+
+    async def replay():
+        if pending:
+            return pending.pop(0)
+        return await receive()
+
+    return replay
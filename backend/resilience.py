@@ -0,0 +1,134 @@
+"""
+Retry/backoff policy and circuit breaker for upstream calls
+"""
+import os
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+
+class UpstreamError(Exception):
+    """Base class for failures of the upstream LLM service."""
+
+
+class CircuitOpenError(UpstreamError):
+    """Raised without calling upstream while the circuit breaker is open."""
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After as seconds; accepts both delta-seconds and HTTP-date forms."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter, honoring the server's Retry-After."""
+
+    def __init__(self, max_attempts: int, base_delay: float, max_delay: float):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    @classmethod
+    def from_env(cls) -> "RetryPolicy":
+        return cls(
+            max_attempts=int(os.getenv("GROQ_RETRY_ATTEMPTS", 3)),
+            base_delay=float(os.getenv("GROQ_RETRY_BASE_DELAY", 0.5)),
+            max_delay=float(os.getenv("GROQ_RETRY_MAX_DELAY", 8)),
+        )
+
+    def delay(self, attempt: int, retry_after: Optional[str] = None) -> Optional[float]:
+        """Seconds to wait before retry number `attempt` (1-based), or None to give up."""
+        if attempt >= self.max_attempts:
+            return None
+        server_delay = parse_retry_after(retry_after)
+        if server_delay is not None:
+            # Waiting longer than our budget is worse than falling back now
+            return server_delay if server_delay <= self.max_delay else None
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures; lets one probe through after `reset_timeout`."""
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._probe_started = 0.0
+        self.successes = 0
+        self.failures = 0
+        self.short_circuited = 0
+        self.times_opened = 0
+
+    @classmethod
+    def from_env(cls, name: str) -> "CircuitBreaker":
+        return cls(
+            name,
+            failure_threshold=int(os.getenv("GROQ_BREAKER_FAILURES", 5)),
+            reset_timeout=float(os.getenv("GROQ_BREAKER_RESET", 30)),
+        )
+
+    def allow(self) -> bool:
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+            self._probe_in_flight = False
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.HALF_OPEN:
+            # A probe that never reported back (lost task) must not hold the slot forever
+            stuck = self._probe_in_flight and time.monotonic() - self._probe_started >= self.reset_timeout
+            if not self._probe_in_flight or stuck:
+                self._probe_in_flight = True
+                self._probe_started = time.monotonic()
+                return True
+        self.short_circuited += 1
+        return False
+
+    def release(self):
+        """Frees the probe slot without a verdict (the call was cancelled or failed locally)."""
+        self._probe_in_flight = False
+
+    def record_success(self):
+        self.successes += 1
+        self.consecutive_failures = 0
+        self._probe_in_flight = False
+        self.state = self.CLOSED
+
+    def record_failure(self):
+        self.failures += 1
+        self.consecutive_failures += 1
+        self._probe_in_flight = False
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.times_opened += 1
+                print(f"⚠ Circuit '{self.name}' opened after {self.consecutive_failures} failure(s); using offline fallbacks.")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "successes": self.successes,
+            "failures": self.failures,
+            "short_circuited": self.short_circuited,
+            "times_opened": self.times_opened,
+        }
@@ -0,0 +1,112 @@
+"""
+Picks the Groq text model per task and prompt size, with per-route metrics
+"""
+import os
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from metrics import LatencyWindow
+
+SMALL_MODEL = "llama-3.1-8b-instant"
+LARGE_MODEL = "llama-3.3-70b-versatile"
+
+# Default route per task: (tier, largest prompt in chars the small tier handles, escalate on invalid output)
+# Override with MODEL_ROUTE_<TASK>_TIER (small/large) / _MAX_CHARS / _ESCALATE (1/0).
+DEFAULT_ROUTES = {
+    "chat": ("small", 4000, False),
+    "summary": ("small", 8000, False),
+    "recommendation": ("small", 4000, True),
+    "wellness_plan": ("large", 0, False),
+    "doubt": ("large", 0, False),
+}
+
+
+@dataclass
+class Route:
+    tier: str
+    small_max_chars: int
+    escalate: bool
+
+
+def load_routes() -> Dict[str, Route]:
+    routes = {}
+    for task, (tier, max_chars, escalate) in DEFAULT_ROUTES.items():
+        prefix = f"MODEL_ROUTE_{task.upper()}"
+        routes[task] = Route(
+            tier=os.getenv(f"{prefix}_TIER", tier),
+            small_max_chars=int(os.getenv(f"{prefix}_MAX_CHARS", max_chars)),
+            escalate=os.getenv(f"{prefix}_ESCALATE", "1" if escalate else "0") == "1",
+        )
+    return routes
+
+
+class RouteMetrics:
+    def __init__(self):
+        self.latency = LatencyWindow()
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def record(self, seconds: float, usage: dict):
+        self.calls += 1
+        self.latency.record(seconds)
+        self.prompt_tokens += usage.get("prompt_tokens", 0)
+        self.completion_tokens += usage.get("completion_tokens", 0)
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            **self.latency.summary("latency"),
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+        }
+
+
+class ModelRouter:
+    """Sends a task to the small model unless its route asks for the large one or the prompt is too long.
+
+    Routes flagged `escalate` retry on the large model when the small model's output
+    fails the caller's validation.
+    """
+
+    def __init__(self, routes: Dict[str, Route], small_model: str, large_model: str):
+        self.routes = routes
+        self.models = {"small": small_model, "large": large_model}
+        self._metrics: Dict[str, RouteMetrics] = {}
+        self.escalations = {task: 0 for task in routes}
+
+    @classmethod
+    def from_env(cls) -> "ModelRouter":
+        return cls(
+            load_routes(),
+            small_model=os.getenv("GROQ_SMALL_MODEL", SMALL_MODEL),
+            large_model=os.getenv("GROQ_LARGE_MODEL", LARGE_MODEL),
+        )
+
+    def pick(self, task: str, prompt: str) -> str:
+        route = self.routes.get(task)
+        if route is None or route.tier != "small" or len(prompt) > route.small_max_chars:
+            return self.models["large"]
+        return self.models["small"]
+
+    def escalation(self, task: str, model: str) -> Optional[str]:
+        """The model to retry with after `model` produced invalid output, if the route allows it."""
+        route = self.routes.get(task)
+        if route is None or not route.escalate or model == self.models["large"]:
+            return None
+        self.escalations[task] += 1
+        return self.models["large"]
+
+    def record(self, task: str, model: str, seconds: float, usage: Optional[dict] = None):
+        key = f"{task}:{model}"
+        metrics = self._metrics.get(key)
+        if metrics is None:
+            metrics = self._metrics[key] = RouteMetrics()
+        metrics.record(seconds, usage or {})
+
+    def stats(self) -> dict:
+        return {
+            "models": self.models,
+            "routes": {key: metrics.stats() for key, metrics in sorted(self._metrics.items())},
+            "escalations": self.escalations,
+        }
@@ -0,0 +1,54 @@
+"""
+Coalescing of identical in-flight upstream requests
+"""
+import asyncio
+import hashlib
+from typing import Any, Awaitable, Callable, Dict
+
+
+def request_fingerprint(*parts: Any) -> str:
+    """Hashes the parts that make two upstream requests interchangeable."""
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode()
+        elif not isinstance(part, (bytes, bytearray, memoryview)):
+            part = repr(part).encode()
+        digest.update(part)
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+class SingleFlight:
+    """Concurrent callers with the same key share one upstream call and its result."""
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            self.leaders += 1
+            # Run as its own task so one cancelled caller doesn't cancel the others
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved even if every caller went away
+            task.exception()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._inflight),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+        }
@@ -0,0 +1,44 @@
+import asyncio
+
+from doubt_cache import DoubtCache
+from intents import INTENTS, IntentEngine
+from models import UserContext
+
+CONTEXT = UserContext(user_id="asha", name="Asha", health_goals=["Be Healthy"])
+
+# (stored question, new question): similar wording, different medical question
+DIFFERENT_QUESTIONS = [
+    ("What foods should people with high blood pressure eat for breakfast?",
+     "What foods should people with low blood pressure eat for breakfast?"),
+    ("What are the side effects of taking metformin every morning with food?",
+     "What are the side effects of taking metoprolol every morning with food?"),
+    ("Is it safe to do HIIT workouts while pregnant?",
+     "Is it safe to do HIIT workouts while breastfeeding?"),
+    ("Is coffee good for my heart?", "Is coffee bad for my heart?"),
+    ("How much vitamin d should I take daily?", "How much vitamin c should I take daily?"),
+    ("Should I take aspirin with alcohol?", "Should I take aspirin without alcohol?"),
+]
+
+# (stored question, new question): the same question reworded
+SAME_QUESTIONS = [
+    ("How much water should I drink every day?", "how much water should i drink per day"),
+    ("What should I eat for breakfast with high blood pressure?",
+     "With high blood pressure, what should I eat for breakfast?"),
+    ("How many hours of sleep do I need?", "how many hours sleep do i need"),
+]
+
+
+def _cache_with(question: str) -> DoubtCache:
+    cache = DoubtCache(IntentEngine(INTENTS).model, maxsize=100, threshold=0.8, ttl=3600)
+    asyncio.run(cache.store(question, CONTEXT, "Stored answer for Asha."))
+    return cache
+
+
+def test_different_questions_miss():
+    for stored, asked in DIFFERENT_QUESTIONS:
+        assert _cache_with(stored).lookup(asked, CONTEXT) is None, asked
+
+
+def test_reworded_questions_hit():
+    for stored, asked in SAME_QUESTIONS:
+        assert _cache_with(stored).lookup(asked, CONTEXT) == "Stored answer for Asha.", asked
@@ -0,0 +1,123 @@
+"""
+Time-series storage and aggregation for vitals, steps and calories
+"""
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from pymongo.errors import CollectionInvalid, OperationFailure
+
+from models import MetricSample
+from tracing import span
+
+METRICS = ("heart_rate", "steps", "calories_burned", "energy_level", "sleep_hours", "bmi")
+
+# Bucket size -> (length, default window when no start is given)
+BUCKETS = {
+    "minute": (timedelta(minutes=1), timedelta(hours=6)),
+    "hour": (timedelta(hours=1), timedelta(days=2)),
+    "day": (timedelta(days=1), timedelta(days=30)),
+}
+
+MAX_POINTS = 2000
+
+# Date parts that identify a bucket; $dateFromParts rebuilds its start (no $dateTrunc, which needs 5.0)
+BUCKET_PARTS = {
+    "minute": ("year", "month", "day", "hour", "minute"),
+    "hour": ("year", "month", "day", "hour"),
+    "day": ("year", "month", "day"),
+}
+PART_OPERATORS = {"year": "$year", "month": "$month", "day": "$dayOfMonth", "hour": "$hour", "minute": "$minute"}
+
+
+def _as_utc(value: datetime) -> datetime:
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+class MetricSeriesStore:
+    """Append-only samples in a MongoDB time-series collection, downsampled on read.
+
+    `retention_days` of 0 keeps samples forever.
+    """
+
+    def __init__(self, name: str, retention_days: int):
+        self.name = name
+        self.retention_days = retention_days
+        self.collection = None
+        self.ingested = 0
+
+    async def setup(self, db):
+        options = {"timeseries": {"timeField": "ts", "metaField": "meta", "granularity": "minutes"}}
+        if self.retention_days:
+            options["expireAfterSeconds"] = self.retention_days * 24 * 3600
+        try:
+            await db.create_collection(self.name, **options)
+        except CollectionInvalid:
+            pass  # Already exists
+        except OperationFailure as e:
+            # Pre-5.0 servers have no time-series collections; a plain one (with a TTL index) works the same
+            print(f"⚠ Time-series collection unavailable ({e}); using a regular collection for {self.name}")
+            if self.retention_days:
+                await db.get_collection(self.name).create_index(
+                    "ts", expireAfterSeconds=self.retention_days * 24 * 3600
+                )
+        self.collection = db.get_collection(self.name)
+        await self.collection.create_index([("meta.user_id", 1), ("meta.metric", 1), ("ts", 1)])
+
+    async def ingest(self, user_id: str, samples: List[MetricSample]) -> int:
+        now = datetime.now(timezone.utc)
+        docs = [
+            {
+                "ts": sample.timestamp or now,
+                "meta": {"user_id": user_id, "metric": sample.metric},
+                "value": float(sample.value),
+            }
+            for sample in samples
+        ]
+        if not docs:
+            return 0
+        with span("mongo"):
+            await self.collection.insert_many(docs, ordered=False)
+        self.ingested += len(docs)
+        return len(docs)
+
+    async def series(self, user_id: str, metric: str, bucket: str,
+                     start: Optional[datetime] = None, end: Optional[datetime] = None) -> List[dict]:
+        """Min/max/avg per bucket, oldest first, ready to feed a chart."""
+        size, default_window = BUCKETS[bucket]
+        end = _as_utc(end) if end else datetime.now(timezone.utc)
+        start = _as_utc(start) if start else end - default_window
+        if (end - start) / size > MAX_POINTS:
+            raise ValueError(f"Range too large for '{bucket}' buckets (max {MAX_POINTS} points).")
+
+        pipeline = [
+            {"$match": {
+                "meta.user_id": user_id,
+                "meta.metric": metric,
+                "ts": {"$gte": start, "$lt": end},
+            }},
+            {"$group": {
+                "_id": {"$dateFromParts": {
+                    part: {PART_OPERATORS[part]: "$ts"} for part in BUCKET_PARTS[bucket]
+                }},
+                "min": {"$min": "$value"},
+                "max": {"$max": "$value"},
+                "avg": {"$avg": "$value"},
+                "count": {"$sum": 1},
+            }},
+            {"$sort": {"_id": 1}},
+        ]
+        with span("mongo"):
+            rows = await self.collection.aggregate(pipeline).to_list(length=None)
+        points = []
+        for row in rows:
+            points.append({
+                "t": row["_id"].replace(tzinfo=timezone.utc).isoformat(),
+                "min": row["min"],
+                "max": row["max"],
+                "avg": round(row["avg"], 2),
+                "count": row["count"],
+            })
+        return points
+
+    def stats(self) -> dict:
+        return {"ingested": self.ingested}
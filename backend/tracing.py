@@ -0,0 +1,224 @@
+"""
+Per-request phase timing (Server-Timing header) and Prometheus text exposition
+"""
+import functools
+import inspect
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from fastapi.exceptions import RequestValidationError
+from fastapi.routing import APIRoute
+from starlette.responses import StreamingResponse
+
+# Upper bounds (seconds) of the request duration histogram
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_current: ContextVar[Optional["RequestTrace"]] = ContextVar("request_trace", default=None)
+
+
+class RequestTrace:
+    """Time spent per phase within one request. Phases may repeat; durations add up."""
+
+    def __init__(self, route: str, method: str):
+        self.route = route
+        self.method = method
+        self.started = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.tokens: Dict[str, int] = {}
+        self._lock = threading.Lock()  # Spans can be recorded from asyncio.to_thread workers
+
+    def add(self, phase: str, seconds: float):
+        with self._lock:
+            self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def add_tokens(self, usage: dict):
+        with self._lock:
+            for kind in ("prompt_tokens", "completion_tokens"):
+                self.tokens[kind] = self.tokens.get(kind, 0) + int(usage.get(kind) or 0)
+
+    def server_timing(self, total: Optional[float] = None) -> str:
+        parts = [f"{phase};dur={seconds * 1000:.1f}" for phase, seconds in self.phases.items()]
+        if total is not None:
+            parts.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(parts)
+
+
+def current_trace() -> Optional[RequestTrace]:
+    return _current.get()
+
+
+@contextmanager
+def span(phase: str):
+    """Attributes the time spent in the block to `phase` of the current request (if any)."""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(phase, time.perf_counter() - started)
+
+
+def record_tokens(usage: dict):
+    trace = _current.get()
+    if trace is not None and usage:
+        trace.add_tokens(usage)
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+class TraceRegistry:
+    """Aggregates finished traces per route for /metrics."""
+
+    def __init__(self):
+        self.durations: Dict[Tuple[str, str, str], Histogram] = {}
+        self.phases: Dict[Tuple[str, str], List[float]] = {}  # (route, phase) -> [count, seconds]
+        self.tokens: Dict[Tuple[str, str], int] = {}
+
+    def finish(self, trace: RequestTrace, status: int) -> float:
+        total = time.perf_counter() - trace.started
+        key = (trace.method, trace.route, str(status))
+        histogram = self.durations.get(key)
+        if histogram is None:
+            histogram = self.durations[key] = Histogram(DURATION_BUCKETS)
+        histogram.observe(total)
+        for phase, seconds in trace.phases.items():
+            entry = self.phases.setdefault((trace.route, phase), [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+        for kind, count in trace.tokens.items():
+            self.tokens[(trace.route, kind)] = self.tokens.get((trace.route, kind), 0) + count
+        return total
+
+    def render(self) -> List[str]:
+        lines = [
+            "# HELP aromi_http_request_duration_seconds Request latency by route.",
+            "# TYPE aromi_http_request_duration_seconds histogram",
+        ]
+        for (method, route, status), h in sorted(self.durations.items()):
+            labels = f'method="{method}",route="{route}",status="{status}"'
+            for bound, count in zip(h.buckets, h.counts):
+                lines.append(f'aromi_http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'aromi_http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {h.count}')
+            lines.append(f"aromi_http_request_duration_seconds_sum{{{labels}}} {h.sum:.6f}")
+            lines.append(f"aromi_http_request_duration_seconds_count{{{labels}}} {h.count}")
+
+        lines += [
+            "# HELP aromi_request_phase_seconds_total Time spent per request phase.",
+            "# TYPE aromi_request_phase_seconds_total counter",
+        ]
+        for (route, phase), (_, seconds) in sorted(self.phases.items()):
+            lines.append(f'aromi_request_phase_seconds_total{{route="{route}",phase="{phase}"}} {seconds:.6f}')
+        lines += [
+            "# HELP aromi_request_phase_requests_total Requests that went through each phase.",
+            "# TYPE aromi_request_phase_requests_total counter",
+        ]
+        for (route, phase), (count, _) in sorted(self.phases.items()):
+            lines.append(f'aromi_request_phase_requests_total{{route="{route}",phase="{phase}"}} {count}')
+
+        lines += [
+            "# HELP aromi_llm_tokens_total Groq tokens used by requests per route.",
+            "# TYPE aromi_llm_tokens_total counter",
+        ]
+        for (route, kind), count in sorted(self.tokens.items()):
+            lines.append(f'aromi_llm_tokens_total{{route="{route}",kind="{kind}"}} {count}')
+        return lines
+
+
+registry = TraceRegistry()
+
+
+class TracingRoute(APIRoute):
+    """Route class that traces every request and answers with a Server-Timing header.
+
+    Time between the handler starting and the endpoint function being called is body
+    parsing plus pydantic validation, reported as the `validation` phase.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        call = self.dependant.call
+        if inspect.iscoroutinefunction(call):
+            @functools.wraps(call)
+            async def endpoint(*args, **kwargs):
+                trace = _current.get()
+                if trace is not None:
+                    trace.add("validation", time.perf_counter() - trace.started)
+                return await call(*args, **kwargs)
+
+            self.dependant.call = endpoint
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        route = self.path_format
+
+        async def traced_handler(request):
+            trace = RequestTrace(route, request.method)
+            token = _current.set(trace)
+            try:
+                response = await handler(request)
+            except Exception as e:
+                status = 422 if isinstance(e, RequestValidationError) else getattr(e, "status_code", 500)
+                registry.finish(trace, status)
+                _current.reset(token)
+                raise
+
+            if isinstance(response, StreamingResponse):
+                # The body is produced after the handler returns; finish the trace when it's done
+                response.headers["Server-Timing"] = trace.server_timing()
+                response.body_iterator = _finish_after(response.body_iterator, trace, response.status_code)
+            else:
+                total = registry.finish(trace, response.status_code)
+                response.headers["Server-Timing"] = trace.server_timing(total)
+                _current.reset(token)
+            return response
+
+        return traced_handler
+
+
+async def _finish_after(body_iterator, trace: RequestTrace, status: int):
+    try:
+        async for chunk in body_iterator:
+            yield chunk
+    finally:
+        registry.finish(trace, status)
+
+
+def _metric_name(*parts: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9_]", "_", "_".join(parts)).lower()
+
+
+def render_stats(stats: dict, prefix: str = "aromi") -> List[str]:
+    """Flattens the component stats (as served by /stats) into untyped gauges."""
+    lines = []
+
+    def walk(path: List[str], value):
+        if isinstance(value, dict):
+            for key, sub_value in value.items():
+                walk(path + [str(key)], sub_value)
+        elif isinstance(value, bool):
+            lines.append(f"{_metric_name(prefix, *path)} {int(value)}")
+        elif isinstance(value, (int, float)):
+            lines.append(f"{_metric_name(prefix, *path)} {value}")
+
+    walk([], stats)
+    return lines
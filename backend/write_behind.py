@@ -0,0 +1,121 @@
+"""
+Write-behind buffering for append-only MongoDB records
+"""
+import asyncio
+import time
+from collections import deque
+from typing import List, Optional
+
+from pymongo.errors import BulkWriteError
+
+from metrics import LatencyWindow
+
+# insert_many error code for a document that is already stored (e.g. from an earlier partial write)
+DUPLICATE_KEY = 11000
+
+
+class WriteBehindBuffer:
+    """Collects documents and writes them with insert_many on a size or time threshold.
+
+    The buffer is bounded: once `max_pending` documents are waiting, the caller that
+    adds the next one flushes inline, so memory stays capped when MongoDB is slow.
+    """
+
+    def __init__(self, name: str, max_batch: int, flush_interval: float, max_pending: int):
+        self.name = name
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.collection = None
+        self._pending: deque = deque()
+        self._lock = asyncio.Lock()
+        self._batch_ready = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.flushed = 0
+        self.batches = 0
+        self.failed_batches = 0
+        self.dropped = 0
+        self.flush_latency = LatencyWindow()
+
+    async def start(self, collection):
+        self.collection = collection
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stops the background flusher and writes out everything still buffered."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        while self._pending:
+            if not await self.flush():
+                break
+
+    async def add(self, doc: dict):
+        if self.collection is None:
+            raise RuntimeError(f"Write-behind buffer '{self.name}' is not started")
+        if len(self._pending) >= self.max_pending:
+            await self.flush()
+        self._pending.append(doc)
+        if len(self._pending) >= self.max_batch:
+            self._batch_ready.set()
+
+    def pending_for(self, field: str, value) -> List[dict]:
+        """Buffered documents not yet visible in MongoDB, oldest first."""
+        return [doc for doc in self._pending if doc.get(field) == value]
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._batch_ready.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._batch_ready.clear()
+            while self._pending:
+                # A failed flush waits for the next interval instead of retrying hot
+                if not await self.flush() or len(self._pending) < self.max_batch:
+                    break
+
+    async def flush(self) -> bool:
+        async with self._lock:
+            if not self._pending:
+                return True
+            batch = [self._pending.popleft() for _ in range(min(self.max_batch, len(self._pending)))]
+            started = time.monotonic()
+            try:
+                await self.collection.insert_many(batch, ordered=False)
+            except Exception as e:
+                self.failed_batches += 1
+                print(f"Write-behind flush error ({self.name}): {e}")
+                retry = batch
+                if isinstance(e, BulkWriteError):
+                    # Unordered: everything without a write error landed, and duplicates are
+                    # already stored (insert_many set their _id on an earlier attempt)
+                    failed = {error["index"] for error in e.details.get("writeErrors", [])
+                              if error.get("code") != DUPLICATE_KEY}
+                    retry = [doc for i, doc in enumerate(batch) if i in failed]
+                    self.flushed += len(batch) - len(retry)
+                if not retry:
+                    return True
+                # Requeue for the next attempt, as long as that keeps the buffer bounded
+                room = max(0, self.max_pending - len(self._pending))
+                for doc in reversed(retry[:room]):
+                    self._pending.appendleft(doc)
+                self.dropped += len(retry) - min(room, len(retry))
+                return False
+            finally:
+                self.flush_latency.record(time.monotonic() - started)
+            self.flushed += len(batch)
+            self.batches += 1
+            return True
+
+    def stats(self) -> dict:
+        return {
+            "depth": len(self._pending),
+            "capacity": self.max_pending,
+            "flushed": self.flushed,
+            "batches": self.batches,
+            "failed_batches": self.failed_batches,
+            "dropped": self.dropped,
+            **self.flush_latency.summary("flush_seconds"),
+        }
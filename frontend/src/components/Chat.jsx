@@ -1,6 +1,7 @@
 import React, { useState, useRef, useEffect } from 'react';
 import { Send, Bot, Mic, MicOff, Volume2 } from 'lucide-react';
 import axios from 'axios';
+import { contextDelta } from '../services/api';
 
 const Chat = ({ messages, setMessages, userContext }) => {
     const [input, setInput] = useState("");
@@ -98,7 +99,7 @@ const Chat = ({ messages, setMessages, userContext }) => {
             const response = await axios.post('http://localhost:8000/chat', {
                 user_id: userContext.user_id,
                 message: userMsg.content,
-                context: userContext
+                context_delta: contextDelta(userContext)
             });
 
             const botMsg = { role: 'assistant', content: response.data.response };
@@ -1,6 +1,7 @@
 import React, { useState } from 'react';
 import { HelpCircle, Send } from 'lucide-react';
 import axios from 'axios';
+import { contextDelta } from '../services/api';
 
 const Doubts = ({ userContext }) => {
     const [question, setQuestion] = useState("");
@@ -18,7 +19,7 @@ const Doubts = ({ userContext }) => {
             const response = await axios.post('http://localhost:8000/clarify-doubt', {
                 user_id: userContext.user_id,
                 question: question,
-                context: userContext
+                context_delta: contextDelta(userContext)
             });
             setAnswer(response.data.answer);
         } catch (error) {
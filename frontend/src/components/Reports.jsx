@@ -1,6 +1,7 @@
 import React, { useState } from 'react';
 import { Camera, Loader2, Sparkles } from 'lucide-react';
 import axios from 'axios';
+import { contextDelta } from '../services/api';
 
 const Reports = ({ userContext }) => {
     const [prescriptionAnalysis, setPrescriptionAnalysis] = useState("");
@@ -37,9 +38,8 @@ const Reports = ({ userContext }) => {
                     const ctx = canvas.getContext('2d');
                     ctx.drawImage(img, 0, 0, width, height);
                     
-                    const compressedBase64 = canvas.toDataURL('image/jpeg', 0.8);
-                    setPreviewUrl(compressedBase64);
-                    analyzePrescription(compressedBase64);
+                    setPreviewUrl(canvas.toDataURL('image/jpeg', 0.8));
+                    canvas.toBlob((blob) => analyzePrescription(blob), 'image/jpeg', 0.8);
                 };
                 img.src = event.target.result;
             };
@@ -47,14 +47,16 @@ const Reports = ({ userContext }) => {
         }
     };
 
-    const analyzePrescription = async (base64Image) => {
+    const analyzePrescription = async (imageBlob) => {
         setAnalyzing(true);
         setPrescriptionAnalysis("");
         try {
-            const response = await axios.post('/api/analyze-prescription', {
-                user_id: userContext.user_id,
-                image_data: base64Image,
-                context: userContext
+            const form = new FormData();
+            form.append('file', imageBlob, 'prescription.jpg');
+            form.append('user_id', userContext.user_id);
+            form.append('context_delta', JSON.stringify(contextDelta(userContext)));
+            const response = await axios.post('/api/analyze-prescription/upload', form, {
+                headers: { 'X-User-Id': userContext.user_id },  // rate-limit key; the body isn't read for that
             });
             
             // Handle both success and error messages returned as success from backend
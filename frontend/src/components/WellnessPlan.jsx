@@ -1,6 +1,7 @@
 import React, { useEffect, useState } from 'react';
 import { Utensils, Award, Dumbbell, Sparkles, Camera, Loader2 } from 'lucide-react';
 import axios from 'axios';
+import { contextDelta } from '../services/api';
 
 const WellnessPlan = ({ userContext }) => {
     const [plan, setPlan] = useState(null);
@@ -40,10 +41,9 @@ const WellnessPlan = ({ userContext }) => {
                     const ctx = canvas.getContext('2d');
                     ctx.drawImage(img, 0, 0, width, height);
                     
-                    // Convert to lower quality jpeg to reduce base64 string length
-                    const compressedBase64 = canvas.toDataURL('image/jpeg', 0.7);
-                    setPreviewUrl(compressedBase64);
-                    analyzeMeal(compressedBase64);
+                    // Convert to lower quality jpeg and upload it as binary (no base64 on the wire)
+                    setPreviewUrl(canvas.toDataURL('image/jpeg', 0.7));
+                    canvas.toBlob((blob) => analyzeMeal(blob), 'image/jpeg', 0.7);
                 };
                 img.src = event.target.result;
             };
@@ -51,14 +51,16 @@ const WellnessPlan = ({ userContext }) => {
         }
     };
 
-    const analyzeMeal = async (base64Image) => {
+    const analyzeMeal = async (imageBlob) => {
         setAnalyzing(true);
         setMealInsight(""); // Clear previous
         try {
-            const response = await axios.post('http://localhost:8000/analyze-meal', {
-                user_id: userContext.user_id,
-                image_data: base64Image,
-                context: userContext
+            const form = new FormData();
+            form.append('file', imageBlob, 'meal.jpg');
+            form.append('user_id', userContext.user_id);
+            form.append('context_delta', JSON.stringify(contextDelta(userContext)));
+            const response = await axios.post('http://localhost:8000/analyze-meal/upload', form, {
+                headers: { 'X-User-Id': userContext.user_id },  // rate-limit key; the body isn't read for that
             });
             setMealInsight(response.data.insight);
         } catch (error) {
@@ -20,6 +20,14 @@ api.interceptors.response.use(
   }
 );
 
+// Fast-changing fields sent with agent requests; the rest of the context lives server-side
+export const contextDelta = (context) => ({
+  mood: context.mood,
+  energy_level: context.energy_level,
+  activity_type: context.activity_type,
+  steps: context.steps,
+});
+
 // Chat API
 export const chatAPI = {
   sendMessage: async (userId, message, context) => {
@@ -27,7 +35,7 @@ export const chatAPI = {
       const response = await api.post('/chat', {
         user_id: userId,
         message: message,
-        context: context,
+        context_delta: contextDelta(context),
       });
       return response.data;
     } catch (error) {
@@ -70,7 +78,7 @@ export const doubtsAPI = {
       const response = await api.post('/clarify-doubt', {
         user_id: userId,
         question: question,
-        context: context,
+        context_delta: contextDelta(context),
       });
       return response.data;
     } catch (error) {